@@ -6,6 +6,23 @@ class QueryRequest(BaseModel):
     model: Optional[str] = "llama3.1:8b"
     selected_files: Optional[List[str]] = None
     selected_tables: Optional[List[str]] = None  # Add this
+    no_cache: bool = False  # Skip the answer cache for this request
+
+class RetrievalCase(BaseModel):
+    question: str = Field(..., min_length=1)
+    relevant_ids: List[str] = []  # Chunk ids, "<filename>:<content hash>:<chunk index>"
+    relevant_files: List[str] = []
+    filter_files: Optional[List[str]] = None
+
+class RetrievalEvalRequest(BaseModel):
+    cases: List[RetrievalCase] = Field(..., min_length=1)
+    k: Optional[int] = None
+
+class BatchRetrievalRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1)
+    k: Optional[int] = None
+    selected_files: Optional[List[str]] = None
+    mode: Optional[str] = None  # vector, lexical or hybrid; defaults to RETRIEVAL_MODE
 
 class QueryResponse(BaseModel):
     answer: str
@@ -18,6 +35,18 @@ class UploadResponse(BaseModel):
     message: str
     filename: str
     status: str = "success"
+    job_id: Optional[str] = None
+
+class JobResponse(BaseModel):
+    id: str
+    filename: str
+    status: str
+    pages_parsed: int = 0
+    chunks_embedded: int = 0
+    elapsed_seconds: float = 0.0
+    chunks_per_second: float = 0.0
+    queued_seconds: float = 0.0
+    error: str = ""
 
 class HealthResponse(BaseModel):
     status: str
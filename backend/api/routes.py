@@ -1,20 +1,30 @@
-from fastapi import APIRouter,UploadFile,File,HTTPException
+from fastapi import APIRouter,UploadFile,File,HTTPException,Response
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from .model import *
 from utils.helpers import is_valid_document,sanitize_filename
 from config import settings
 from utils.logger import logger
+from utils.startup import startup
+from core.query_executor import ExecutorSaturatedError, ExecutorTimeoutError
+import asyncio
 import shutil
 import os
-from pathlib import Path
+import json
 
 
 router = APIRouter()
 rag_system = None
+query_executor = None
 
 def set_rag_system(system):
     global rag_system
     rag_system = system
 
+def set_query_executor(executor):
+    global query_executor
+    query_executor = executor
+
 
 @router.post("/query",response_model=QueryResponse,responses={400: {"model": ErrorResponse}})
 async def query(request:QueryRequest):
@@ -27,27 +37,238 @@ async def query(request:QueryRequest):
     try:
         if not request.query.strip():
             raise HTTPException(status_code=400,detail="Question cannot be empty")
-        if not rag_system:
+        if not rag_system or not query_executor:
             raise HTTPException(status_code=503,detail="RAG system not initialized")
         request_config = {
         "model": request.model,
         "selected_files": request.selected_files,
         "selected_tables": request.selected_tables,  
+        "no_cache": request.no_cache,
         }
-        result = rag_system.query(request.query, config=request_config)
+        if settings.QUERY_ASYNC:
+            result, queue_wait = await query_executor.arun(rag_system.aquery, request.query, config=request_config)
+        else:
+            result, queue_wait = await query_executor.run(rag_system.query, request.query, config=request_config)
+        metadata = result.get('metadata', {})
+        metadata["queue_wait_ms"] = round(queue_wait * 1000, 2)
 
         return QueryResponse(
             answer=result['answer'],
             query_type=result['query_type'],
             context=result.get('context', ''),
             sql_query=result.get('sql_query', ''),
-            metadata=result.get('metadata', {})
+            metadata=metadata
         )
+    except HTTPException:
+        raise
+    except ExecutorSaturatedError as e:
+        logger.warning(f"Rejecting query: {e}")
+        raise HTTPException(status_code=429,detail=str(e),headers={"Retry-After": "1"})
+    except ExecutorTimeoutError as e:
+        logger.warning(f"Query timed out: {e}")
+        raise HTTPException(status_code=503,detail=str(e),headers={"Retry-After": "5"})
     except Exception as e:
         logger.info(f"Error processing query: {e}")
         raise HTTPException(status_code=500,detail=str(e))
     
 
+def _sse(event: str, data: dict) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/query/stream",responses={400: {"model": ErrorResponse}})
+async def query_stream(request:QueryRequest):
+    """
+    Query the RAG system and stream the run as Server-Sent Events.
+
+    Events: `classification`, `retrieval`, one `token` per generated chunk,
+    then `done` with the full result (or `error`).
+    """
+    if not request.query.strip():
+        raise HTTPException(status_code=400,detail="Question cannot be empty")
+    if not rag_system or not query_executor:
+        raise HTTPException(status_code=503,detail="RAG system not initialized")
+    try:
+        # Reject up front with a proper status; the slot itself is taken inside the stream so that
+        # it is only ever held by a running generator, whose finally always releases it
+        query_executor.check_admission()
+    except ExecutorSaturatedError as e:
+        logger.warning(f"Rejecting query: {e}")
+        raise HTTPException(status_code=429,detail=str(e),headers={"Retry-After": "1"})
+
+    request_config = {
+        "model": request.model,
+        "selected_files": request.selected_files,
+        "selected_tables": request.selected_tables,
+        "no_cache": request.no_cache,
+    }
+
+    async def events():
+        acquired = False
+        completed = False
+        final_state = {}
+        try:
+            queue_wait = await query_executor.acquire()
+            acquired = True
+            async with asyncio.timeout(max(query_executor.timeout - queue_wait, 0.001)):
+                async for node, update in rag_system.astream(request.query, config=request_config):
+                    if node == "token":
+                        yield _sse("token", {"text": update})
+                    elif node == "classify_query":
+                        yield _sse("classification", {"query_type": update["query_type"], **update.get("metadata", {})})
+                    elif node in ("retrieve_documents", "hybrid_documents"):
+                        yield _sse("retrieval", {
+                            "retrieved_docs": update.get("metadata", {}).get("retrieved_docs", 0),
+                            "sources": update.get("metadata", {}).get("sources", []),
+                            "error": update.get("error") or update.get("branch_results", {}).get("documents", {}).get("error", "")
+                        })
+                    elif node in ("query_sql", "hybrid_sql"):
+                        yield _sse("retrieval", {
+                            "sql_query": update.get("sql_query", ""),
+                            "rows": len(update.get("sql_result", [])),
+                            "error": update.get("error") or update.get("branch_results", {}).get("sql", {}).get("error", "")
+                        })
+                    elif node == "generate_answer":
+                        final_state = update
+            metadata = final_state.get("metadata", {})
+            metadata["queue_wait_ms"] = round(queue_wait * 1000, 2)
+            yield _sse("done", {
+                "answer": final_state.get("answer", ""),
+                "query_type": final_state.get("query_type", "general"),
+                "context": final_state.get("context", ""),
+                "sql_query": final_state.get("sql_query", ""),
+                "metadata": metadata
+            })
+            completed = True
+        except (ExecutorSaturatedError, ExecutorTimeoutError) as e:
+            logger.warning(f"Rejecting streamed query: {e}")
+            yield _sse("error", {"detail": str(e)})
+        except TimeoutError:
+            query_executor.timed_out += 1
+            logger.warning(f"Streamed query exceeded timeout of {query_executor.timeout}s")
+            yield _sse("error", {"detail": f"Query timed out after {query_executor.timeout}s"})
+        except Exception as e:
+            logger.error(f"Error streaming query: {e}")
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            if acquired:
+                query_executor.release(completed=completed)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/query/stats")
+async def query_stats():
+    """
+    Getting the query worker pool state (in-flight, queue depth, wait times)
+    """
+    if not query_executor:
+        raise HTTPException(status_code=503,detail="Query executor not initialized")
+    return query_executor.stats()
+
+
+@router.get("/llm/stats")
+async def llm_stats():
+    """
+    Getting pooled LLM clients and warmed-up models
+    """
+    if not rag_system:
+        raise HTTPException(status_code=503,detail="RAG system not initialized")
+    return rag_system.llm_service.stats()
+
+
+@router.get("/router/stats")
+async def router_stats():
+    """
+    Getting per-tier query routing hit rates and latency
+    """
+    if not rag_system or not rag_system.graph:
+        raise HTTPException(status_code=503,detail="RAG system not initialized")
+    return rag_system.graph.router.stats()
+
+
+@router.get("/retrieval/stats")
+async def retrieval_stats():
+    """
+    Getting per-mode (vector, lexical, hybrid) retrieval latency and lexical index size
+    """
+    if not rag_system:
+        raise HTTPException(status_code=503,detail="RAG system not initialized")
+    return rag_system.vectorstore_service.stats()
+
+
+@router.post("/retrieval/evaluate")
+async def retrieval_evaluate(request: RetrievalEvalRequest):
+    """
+    Measuring recall@k and latency of every retrieval mode over labelled questions
+    """
+    if not rag_system:
+        raise HTTPException(status_code=503,detail="RAG system not initialized")
+    return await run_in_threadpool(
+        rag_system.vectorstore_service.evaluate,
+        [case.model_dump() for case in request.cases],
+        request.k or settings.TOP_K_RESULTS
+    )
+
+
+@router.post("/retrieve/batch")
+async def retrieve_batch(request: BatchRetrievalRequest):
+    """
+    Retrieving chunks for many questions with one embedding call and one vector query
+    """
+    if not rag_system:
+        raise HTTPException(status_code=503,detail="RAG system not initialized")
+    if request.mode and request.mode not in ("vector", "lexical", "hybrid"):
+        raise HTTPException(status_code=400,detail=f"Unknown retrieval mode {request.mode}")
+    try:
+        results = await run_in_threadpool(
+            rag_system.vectorstore_service.search_batch,
+            request.questions,
+            request.k or settings.TOP_K_RESULTS,
+            request.selected_files or [],
+            request.mode
+        )
+    except Exception as e:
+        logger.error(f"Batch retrieval error: {e}")
+        raise HTTPException(status_code=500,detail=str(e))
+    return {
+        "results": [
+            {
+                "question": question,
+                "documents": [
+                    {
+                        "id": doc.id,
+                        "filename": doc.metadata.get("filename"),
+                        "page": doc.metadata.get("page"),
+                        "content": doc.page_content
+                    }
+                    for doc in docs
+                ]
+            }
+            for question, docs in zip(request.questions, results)
+        ]
+    }
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """
+    Getting answer, embedding and SQL cache hit/miss counters and size
+    """
+    if not rag_system:
+        raise HTTPException(status_code=503,detail="RAG system not initialized")
+    return {
+        "answers": rag_system.answer_cache.stats(),
+        "embeddings": rag_system.vectorstore_service.embedding.stats() if rag_system.vectorstore_service.embedding else {},
+        "sql": rag_system.sql_service.cache_stats()
+    }
+
+
 @router.delete("/document")
 async def delete_document(request: DeleteFileRequest):
     """Delete a document"""
@@ -59,11 +280,11 @@ async def delete_document(request: DeleteFileRequest):
             os.remove(filepath)
             logger.info(f"Deleted file: {filename}")
             
-            # Delete from vectorstore
+            # Delete from catalog and vectorstore
             if rag_system:
                 try:
-                    rag_system.vectorstore_service.delete_documents_by_filename(filename)
-                    logger.info(f"Deleted embeddings for: {filename}")
+                    # Waits for a running ingestion or reconciliation of this file without blocking the loop
+                    await run_in_threadpool(rag_system.remove_document, filename)
                 except Exception as e:
                     logger.warning(f"Could not delete embeddings: {e}")
             
@@ -74,7 +295,7 @@ async def delete_document(request: DeleteFileRequest):
         logger.error(f"Error deleting document: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/upload",response_model=UploadResponse,responses={400: {"model": ErrorResponse}})
+@router.post("/upload",response_model=UploadResponse,responses={400: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
 async def upload(file:UploadFile = File(...)):
     """
     Upload a document to the RAG system.
@@ -82,6 +303,9 @@ async def upload(file:UploadFile = File(...)):
     Supported formats: PDF, TXT, MD, CSV
     """
     try:
+        # Until the system is registered nothing would catalog or index the file
+        if not rag_system:
+            raise HTTPException(status_code=503,detail=f"RAG system {startup.status()}",headers={"Retry-After": "1"})
         # Validate File
         if not file.filename:
             raise HTTPException(status_code=400,detail="No File Selected!")
@@ -94,30 +318,78 @@ async def upload(file:UploadFile = File(...)):
         filepath = os.path.join(settings.DOCUMENTS_DIR,filename)
         with open(filepath,"wb") as buffer:
             shutil.copyfileobj(file.file,buffer)
+        # The job catalogs (and hashes) the file off the event loop before indexing it
+        rag_system.answer_cache.invalidate()
+        job_id = rag_system.ingestion_queue.submit(filename).id
         
         logger.info("Document Uploaded Successfully")
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error Uploading Document:{e}")
         raise HTTPException(status_code=500,detail=str(e))
         
-    return UploadResponse(message="Uploaded Successfully",filename=filename,status="success")
+    return UploadResponse(message="Uploaded Successfully",filename=filename,status="success",job_id=job_id)
 
-@router.get("/health",response_model=HealthResponse)
-async def health():
+@router.get("/jobs/{job_id}",response_model=JobResponse,responses={404: {"model": ErrorResponse}})
+async def get_job(job_id:str):
     """
-    Checking the rag system health
+    Getting the progress of a document ingestion job
     """
     if not rag_system:
         raise HTTPException(status_code=503,detail="RAG system not initialized")
-    
-    services = {
-        "llm":"healthy" if rag_system.llm_service.get_llm() else "unavaiable",
-        "vectorstore":"healthy" if rag_system.vectorstore_service.vectorstore else "unavaliable",
-        "sql_db":"healthy" if rag_system.sql_service.db else "unavaliable"
-    }
-    return HealthResponse(status="healthy" if rag_system.initialized else "initializing",
-                          services=services)
+    job = rag_system.ingestion_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404,detail="Job not found")
+    return JobResponse(**job)
+
+@router.get("/health",response_model=HealthResponse)
+async def health(response: Response):
+    """
+    Checking the rag system health: overall startup status, the readiness of every service
+    and whether the llm, vector store and database are actually available; 503 after a failed start
+    """
+    status = startup.status()
+    services = {name: state["state"] for name, state in startup.services.items()}
+    if rag_system:
+        # Startup only records that a service initialized; these check its client is still there
+        checks = {
+            "llm": rag_system.llm_service.get_llm() is not None,
+            "vectorstore": rag_system.vectorstore_service.vectorestore is not None,
+            "sql": rag_system.sql_service.db is not None,
+        }
+        unavailable = [name for name, ok in checks.items() if not ok]
+        for name in unavailable:
+            services[name] = "unavailable"
+        if unavailable and status != "failed":
+            status = "degraded"
+    if status == "failed":
+        response.status_code = 503
+    return HealthResponse(status=status, services=services)
+
+@router.get("/live")
+async def live():
+    """
+    Liveness probe: the process is up and its event loop answers
+    """
+    return {"status": "alive"}
+
+@router.get("/ready")
+async def ready():
+    """
+    Readiness probe: 200 once queries can be served, 503 while starting or after a failed start
+    """
+    if not rag_system or not query_executor:
+        raise HTTPException(status_code=503,detail=f"RAG system {startup.status()}",headers={"Retry-After": "1"})
+    return {"status": startup.status()}
+
+@router.get("/startup")
+async def startup_profile():
+    """
+    Startup profile: milestones, import and initialization phases and per-service states
+    """
+    return startup.report()
 
 @router.get("/document")
 async def document():
@@ -125,13 +397,46 @@ async def document():
     Getting the uploaded documents
     """
     try:
-        docs_path = Path(settings.DOCUMENTS_DIR)
-        docs = [f.name for f in docs_path.iterdir() if f.is_file()]
-        return {"documents":docs,"count":len(docs)}
+        if not rag_system:
+            raise HTTPException(status_code=503, detail="RAG system not initialized")
+        docs = rag_system.catalog_service.get_titles()
+        return {
+            "documents":docs,
+            "details":rag_system.catalog_service.list_documents(),
+            "count":len(docs)
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing documents {e}")
         raise HTTPException(status_code=500,detail=str(e))
 
+@router.get("/sql/results/{result_id}")
+async def sql_results(result_id:str, page:int = 1, page_size:int = 100):
+    """
+    Getting one page of the full rows behind a (possibly truncated) SQL result
+    """
+    if not rag_system:
+        raise HTTPException(status_code=503, detail="RAG system not initialized")
+    if page < 1 or not 1 <= page_size <= settings.SQL_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"page must be >= 1 and page_size between 1 and {settings.SQL_MAX_ROWS}")
+    try:
+        return await run_in_threadpool(rag_system.sql_service.fetch_page, result_id, page, page_size)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Result not found or expired")
+    except Exception as e:
+        logger.error(f"Error fetching SQL results: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/sql/pool")
+async def sql_pool():
+    """
+    Getting read-only SQLite connection pool metrics
+    """
+    if not rag_system or not rag_system.sql_service.pool:
+        raise HTTPException(status_code=503, detail="Database not initialized")
+    return rag_system.sql_service.pool.stats()
+
 @router.get("/tables")
 async def get_tables():
     """
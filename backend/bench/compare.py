@@ -0,0 +1,70 @@
+"""Compare two benchmark result files
+
+    python -m bench.compare bench/results/before.json bench/results/after.json --threshold 0.1
+
+Prints every tracked metric with its relative change and exits with status 1 when
+one of them regressed by more than the threshold.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def metrics(results: dict) -> dict:
+    """Tracked metrics as name -> (value, higher_is_better)"""
+    tracked = {
+        "startup.cold_s": (results.get("startup", {}).get("cold_s"), False),
+        "startup.warm_s": (results.get("startup", {}).get("warm_s"), False),
+        "startup.warm_reconciled_s": (results.get("startup", {}).get("warm_reconciled_s"), False),
+        "startup.cold_serving_s": (results.get("startup", {}).get("cold_serving_s"), False),
+        "startup.warm_serving_s": (results.get("startup", {}).get("warm_serving_s"), False),
+        "ingestion.chunks_per_s": (results.get("ingestion", {}).get("chunks_per_s"), True),
+        "ingestion.peak_rss_mb": (results.get("ingestion", {}).get("peak_rss_mb"), False),
+        "peak_rss_mb": (results.get("peak_rss_mb"), False),
+    }
+    for route, summary in results.get("queries", {}).items():
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            tracked[f"queries.{route}.{key}"] = (summary.get(key), False)
+        tracked[f"queries.{route}.throughput_qps"] = (summary.get("throughput_qps"), True)
+        tracked[f"queries.{route}.errors"] = (summary.get("errors"), False)
+    return tracked
+
+
+def compare(before: dict, after: dict, threshold: float) -> list:
+    """Rows of (metric, before, after, change, regressed)"""
+    rows = []
+    old, new = metrics(before), metrics(after)
+    for name, (value, higher_is_better) in new.items():
+        previous = old.get(name, (None, higher_is_better))[0]
+        if value is None or previous is None:
+            rows.append((name, previous, value, None, False))
+            continue
+        change = (value - previous) / previous if previous else (1.0 if value else 0.0)
+        worse = -change if higher_is_better else change
+        rows.append((name, previous, value, change, worse > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("before", type=Path)
+    parser.add_argument("after", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression")
+    args = parser.parse_args()
+    before = json.loads(args.before.read_text())
+    after = json.loads(args.after.read_text())
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+
+    rows = compare(before, after, args.threshold)
+    for name, previous, value, change, regressed in rows:
+        delta = f"{change:+.1%}" if change is not None else "n/a"
+        print(f"{name:40} {previous!s:>12} {value!s:>12} {delta:>9}{'  REGRESSION' if regressed else ''}")
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
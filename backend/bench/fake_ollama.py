@@ -0,0 +1,188 @@
+"""Deterministic stand-in for the Ollama HTTP API used by the benchmarks
+
+Embeddings are hashed bags of words, so texts sharing words are similar and every
+run produces the same vectors. Generations stream a fixed number of tokens with a
+configurable delay. DSPy prompts (sent to the OpenAI-compatible chat endpoint) are
+answered in the chat adapter's field format: the classifier's query_type is taken
+from ROUTE_KEYWORDS, the generated SQL from --sql.
+"""
+import argparse
+import hashlib
+import json
+import math
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROUTE_KEYWORDS = {
+    "hybrid": ("compare", "against"),
+    "sql": ("how many", "total", "average", "orders", "customers"),
+    "document": ("report", "document", "policy", "according"),
+}
+DEFAULT_SQL = "SELECT region, COUNT(*) AS orders, SUM(amount) AS total FROM orders JOIN customers ON customers.id = orders.customer_id GROUP BY region"
+FIELD = re.compile(r"\[\[ ## (\w+) ## \]\]")
+WORD = re.compile(r"[a-z0-9]+")
+
+
+def embed(text: str, dimensions: int) -> list:
+    """Normalized hashed bag of words"""
+    vector = [0.0] * dimensions
+    for word in WORD.findall(text.lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector))
+    if not norm:
+        vector[0], norm = 1.0, 1.0
+    return [v / norm for v in vector]
+
+
+def classify(question: str) -> str:
+    question = question.lower()
+    for query_type, keywords in ROUTE_KEYWORDS.items():
+        if any(keyword in question for keyword in keywords):
+            return query_type
+    return "general"
+
+
+class FakeOllama(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, dimensions: int, token_latency: float, prompt_latency: float, answer_tokens: int, sql: str):
+        super().__init__(("127.0.0.1", port), Handler)
+        self.dimensions = dimensions
+        self.token_latency = token_latency
+        self.prompt_latency = prompt_latency
+        self.answer_tokens = answer_tokens
+        self.sql = sql
+
+    def dspy_answer(self, prompt: str) -> str:
+        """Fill every output field a DSPy chat-adapter prompt asks for"""
+        head, _, instructions = prompt.rpartition("Respond with the corresponding output fields")
+        # The first question field is the format template, the last one the actual input
+        questions = re.findall(r"\[\[ ## question ## \]\]\s*(.*?)(?:\n\s*\n|\[\[ ## |$)", head, re.S)
+        question = questions[-1].strip() if questions else ""
+        values = {
+            "query_type": classify(question),
+            "confidence": "0.9",
+            "sql_query": self.sql,
+        }
+        fields = [name for name in dict.fromkeys(FIELD.findall(instructions)) if name != "completed"]
+        body = "".join(f"[[ ## {name} ## ]]\n{values.get(name, 'Benchmark answer.')}\n\n" for name in fields)
+        return body + "[[ ## completed ## ]]"
+
+    def answer(self, prompt: str) -> list:
+        if "[[ ## " in prompt:
+            return [self.dspy_answer(prompt)]
+        return [f"token{i} " for i in range(self.answer_tokens)] if prompt else [""]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chunk(self, payload: dict):
+        line = json.dumps(payload).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+    def _openai_chat(self, request: dict):
+        """OpenAI-compatible endpoint, used by DSPy's LM client"""
+        server = self.server
+        prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+        text = "".join(server.answer(prompt))
+        time.sleep(server.prompt_latency + server.token_latency * len(text.split()))
+        prompt_tokens, completion_tokens = len(prompt.split()), len(text.split())
+        self._json({
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            return self._json({"version": "0.0.0-bench"})
+        if self.path == "/api/tags":
+            return self._json({"models": []})
+        self._json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        if self.path == "/api/embed":
+            inputs = request.get("input", [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            return self._json({"model": request.get("model"), "embeddings": [embed(t, server.dimensions) for t in inputs]})
+        if self.path == "/api/embeddings":
+            return self._json({"embedding": embed(request.get("prompt", ""), server.dimensions)})
+        if self.path == "/api/show":
+            return self._json({"modelfile": "", "parameters": "", "template": "{{ .Prompt }}", "details": {}, "model_info": {}})
+        if self.path.endswith("/chat/completions"):
+            return self._openai_chat(request)
+        if self.path not in ("/api/generate", "/api/chat"):
+            return self._json({"error": "not found"}, 404)
+
+        if self.path == "/api/chat":
+            prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+        else:
+            prompt = request.get("prompt", "")
+        tokens = server.answer(prompt)
+        final = {
+            "model": request.get("model"),
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": len(prompt.split()),
+            "eval_count": len(tokens),
+        }
+        time.sleep(server.prompt_latency)
+        if not request.get("stream", True):
+            time.sleep(server.token_latency * len(tokens))
+            text = "".join(tokens)
+            content = {"message": {"role": "assistant", "content": text}} if self.path == "/api/chat" else {"response": text}
+            return self._json({**final, **content})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in tokens:
+            time.sleep(server.token_latency)
+            content = {"message": {"role": "assistant", "content": token}} if self.path == "/api/chat" else {"response": token}
+            self._chunk({"model": request.get("model"), "done": False, **content})
+        self._chunk({**final, "response": ""} if self.path == "/api/generate" else {**final, "message": {"role": "assistant", "content": ""}})
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--token-latency", type=float, default=0.005, help="Seconds per generated token")
+    parser.add_argument("--prompt-latency", type=float, default=0.02, help="Seconds before the first token")
+    parser.add_argument("--answer-tokens", type=int, default=32)
+    parser.add_argument("--sql", default=DEFAULT_SQL, help="Query returned for every text-to-SQL prompt")
+    args = parser.parse_args()
+    server = FakeOllama(args.port, args.dimensions, args.token_latency, args.prompt_latency, args.answer_tokens, args.sql)
+    print(f"Fake Ollama listening on 127.0.0.1:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Seeded SQLite database and text corpus for the benchmarks"""
+import random
+import sqlite3
+from pathlib import Path
+
+REGIONS = ["north", "south", "east", "west", "central"]
+TOPICS = ["refund policy", "shipping delays", "warranty claims", "supplier audit", "quarterly revenue",
+          "data retention", "onboarding process", "security incidents", "pricing changes", "customer churn"]
+WORDS = ("the team reviewed results against targets while customers reported issues with delivery and billing "
+         "so management approved new controls budget training and monitoring across every region").split()
+
+
+def make_database(path: Path, customers: int, orders: int, seed: int = 0) -> Path:
+    """customers(id, name, region) and orders(id, customer_id, amount, status, created_at)"""
+    rng = random.Random(seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.unlink(missing_ok=True)
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT, region TEXT)")
+        conn.execute(
+            "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(id), "
+            "amount REAL, status TEXT, created_at TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO customers VALUES (?, ?, ?)",
+            ((i, f"Customer {i}", rng.choice(REGIONS)) for i in range(1, customers + 1))
+        )
+        conn.executemany(
+            "INSERT INTO orders VALUES (?, ?, ?, ?, ?)",
+            ((i, rng.randint(1, customers), round(rng.uniform(5, 500), 2), rng.choice(["paid", "refunded", "pending"]),
+              f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}") for i in range(1, orders + 1))
+        )
+    return path
+
+
+def make_corpus(directory: Path, files: int, paragraphs: int, seed: int = 0) -> list:
+    """Markdown reports, one topic each; returns the file paths"""
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(files):
+        topic = TOPICS[i % len(TOPICS)]
+        lines = [f"# Report {i}: {topic}", ""]
+        for p in range(paragraphs):
+            sentence = " ".join(rng.choice(WORDS) for _ in range(60))
+            lines += [f"Section {p} on {topic}: {sentence}.", ""]
+        path = directory / f"report_{i:03d}_{topic.replace(' ', '_')}.md"
+        path.write_text("\n".join(lines), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def questions(route: str, count: int, seed: int = 0) -> list:
+    """Questions the fake classifier sends down the given route"""
+    rng = random.Random(f"{seed}-{route}")
+    templates = {
+        "document": "What does the report say about {topic}?",
+        "sql": "How many orders were placed in the {region} region?",
+        "hybrid": "Compare the report on {topic} against orders in the {region} region",
+        "general": "Hello, what kinds of questions can you help me with? ({i})",
+    }
+    return [templates[route].format(topic=rng.choice(TOPICS), region=rng.choice(REGIONS), i=i) for i in range(count)]
@@ -0,0 +1,341 @@
+"""End-to-end benchmark of the API against the fake Ollama server
+
+    python -m bench.run --files 40 --concurrency 8 --queries 50
+
+Builds a fresh working directory with a generated database and corpus, then measures:
+cold startup (empty stores; time until /api/live and until the ready path answer), ingestion through /api/upload, warm startup (persisted
+stores; time until the ready path answers and until document reconciliation has finished), /api/query latency per
+route under concurrent clients and the peak RSS of the ingestion and query servers. Results are written as JSON;
+compare two runs with `python -m bench.compare`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from bench.fixtures import make_corpus, make_database, questions
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+ROUTES = ("document", "sql", "hybrid", "general")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: list, q: float):
+    """Linear interpolation between closest ranks, values sorted"""
+    if not values:
+        return None
+    position = (len(values) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def latency_summary(latencies: list) -> dict:
+    values = sorted(latencies)
+    summary = {
+        "p50_ms": percentile(values, 0.50),
+        "p95_ms": percentile(values, 0.95),
+        "p99_ms": percentile(values, 0.99),
+        "mean_ms": sum(values) / len(values) if values else None,
+        "max_ms": values[-1] if values else None,
+    }
+    return {key: round(value, 2) if value is not None else None for key, value in summary.items()}
+
+
+def git_revision() -> dict:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "--short", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--", "."))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def wait_for_port(port: int, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.02)
+    raise TimeoutError(f"Nothing listening on port {port} after {timeout}s")
+
+
+def stop_process(process: subprocess.Popen):
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+class Server:
+    """The API as a uvicorn subprocess in the benchmark's working directory"""
+    def __init__(self, workdir: Path, env: dict, ready_path: str, timeout: float) -> None:
+        self.workdir = workdir
+        self.env = env
+        self.ready_path = ready_path
+        self.timeout = timeout
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.process = None
+        self.started = None
+
+    def start(self) -> tuple:
+        """Launch and return the seconds until /api/live and until the ready path answer 200"""
+        log = open(self.workdir / "server.log", "ab")
+        start = self.started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(self.port),
+             "--app-dir", str(BACKEND_DIR), "--log-level", "warning"],
+            cwd=self.workdir, env=self.env, stdout=log, stderr=subprocess.STDOUT
+        )
+        log.close()
+        with httpx.Client(base_url=self.url, timeout=5) as client:
+            serving = self._wait(client, "/api/live", start)
+            return serving, self._wait(client, self.ready_path, start)
+
+    def _wait(self, client: httpx.Client, path: str, start: float) -> float:
+        while time.perf_counter() < start + self.timeout:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with {self.process.returncode}, see {self.workdir / 'server.log'}")
+            try:
+                if client.get(path).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.TransportError:
+                pass
+            time.sleep(0.02)
+        raise TimeoutError(f"{path} not answering after {self.timeout}s, see {self.workdir / 'server.log'}")
+
+    def wait_warm(self) -> float:
+        """Seconds from launch until the server has reconciled its documents (the "warm" startup milestone)"""
+        with httpx.Client(base_url=self.url, timeout=5) as client:
+            while time.perf_counter() < self.started + self.timeout:
+                profile = client.get("/api/startup").json()
+                if "warm" in profile["milestones"]:
+                    return time.perf_counter() - self.started
+                if profile["status"] == "failed":
+                    raise RuntimeError(f"Server failed to start: {profile['error']}")
+                time.sleep(0.02)
+        raise TimeoutError(f"Documents not reconciled after {self.timeout}s, see {self.workdir / 'server.log'}")
+
+    def peak_rss_mb(self):
+        """High-water mark of the server's resident set (Linux only)"""
+        try:
+            for line in Path(f"/proc/{self.process.pid}/status").read_text().splitlines():
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            pass
+        return None
+
+    def stop(self):
+        if self.process:
+            stop_process(self.process)
+            self.process = None
+
+
+def ingest(server: Server, paths: list, timeout: float) -> dict:
+    """Upload the corpus and wait for every ingestion job"""
+    start = time.perf_counter()
+    with httpx.Client(base_url=server.url, timeout=60) as client:
+        jobs = []
+        for path in paths:
+            with open(path, "rb") as f:
+                response = client.post("/api/upload", files={"file": (path.name, f, "text/markdown")})
+            response.raise_for_status()
+            jobs.append(response.json()["job_id"])
+        results = {}
+        deadline = time.perf_counter() + timeout
+        while len(results) < len(jobs):
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"Ingestion unfinished after {timeout}s")
+            for job_id in jobs:
+                if job_id not in results:
+                    job = client.get(f"/api/jobs/{job_id}").json()
+                    if job["status"] in ("completed", "failed"):
+                        results[job_id] = job
+            time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    chunks = sum(job["chunks_embedded"] for job in results.values())
+    return {
+        "files": len(paths),
+        "failed": sum(job["status"] == "failed" for job in results.values()),
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "chunks_per_s": round(chunks / elapsed, 2) if elapsed else None,
+    }
+
+
+async def load(server: Server, items: list, concurrency: int, warmup: int, use_cache: bool) -> dict:
+    """Send the questions after the first `warmup` ones from `concurrency` clients and summarize their latency"""
+    latencies, errors, query_types = [], [], Counter()
+    node_ms, server_ms = Counter(), []
+    queue = asyncio.Queue()
+    for item in items[warmup:]:
+        queue.put_nowait(item)
+
+    async def ask(client, question):
+        return await client.post("/api/query", json={"query": question, "no_cache": not use_cache})
+
+    async def worker(client):
+        while not queue.empty():
+            question = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await ask(client, question)
+            except httpx.HTTPError as e:
+                errors.append(repr(e))
+                continue
+            elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code != 200:
+                errors.append(f"{response.status_code}: {response.text[:200]}")
+                continue
+            latencies.append(elapsed)
+            body = response.json()
+            query_types[body.get("query_type")] += 1
+            timings = body.get("metadata", {}).get("timings", {})
+            node_ms.update(timings.get("nodes", {}))
+            if "total_ms" in timings:
+                server_ms.append(timings["total_ms"])
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=server.url, timeout=300, limits=limits) as client:
+        for question in items[:warmup]:
+            await ask(client, question)
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(items) - warmup,
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "throughput_qps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        **latency_summary(latencies),
+        "server_mean_ms": round(sum(server_ms) / len(server_ms), 2) if server_ms else None,
+        "node_mean_ms": {node: round(ms / len(latencies), 2) for node, ms in node_ms.items()} if latencies else {},
+        "query_types": dict(query_types),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the RAG API")
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--files", type=int, default=20, help="Documents in the generated corpus")
+    parser.add_argument("--paragraphs", type=int, default=40, help="Paragraphs per document")
+    parser.add_argument("--routes", nargs="+", default=list(ROUTES), choices=ROUTES)
+    parser.add_argument("--queries", type=int, default=40, help="Measured queries per route")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured queries per route")
+    parser.add_argument("--cache", action="store_true", help="Let queries use the answer cache")
+    parser.add_argument("--token-latency", type=float, default=0.005)
+    parser.add_argument("--prompt-latency", type=float, default=0.02)
+    parser.add_argument("--answer-tokens", type=int, default=32)
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--ready-path", default="/api/ready", help="Polled until it answers 200 to time startup")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Extra server settings")
+    parser.add_argument("--workdir", type=Path, help="Keep the working directory here instead of a temporary one")
+    parser.add_argument("--output", type=Path, help="Result file (default bench/results/<time>-<commit>.json)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="rag-bench-"))
+    if args.workdir and workdir.exists():
+        shutil.rmtree(workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    corpus = make_corpus(workdir / "corpus", args.files, args.paragraphs, args.seed)
+    database = make_database(workdir / "data" / "bench.db", args.customers, args.orders, args.seed)
+
+    ollama_port = free_port()
+    ollama = subprocess.Popen(
+        [sys.executable, "-m", "bench.fake_ollama", "--port", str(ollama_port),
+         "--token-latency", str(args.token_latency), "--prompt-latency", str(args.prompt_latency),
+         "--answer-tokens", str(args.answer_tokens), "--dimensions", str(args.dimensions)],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL
+    )
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(BACKEND_DIR),
+        "OLLAMA_BASE_URL": f"http://127.0.0.1:{ollama_port}",
+        "DATABASE_PATH": str(database),
+        **dict(item.split("=", 1) for item in args.env),
+    }
+    server = Server(workdir, env, args.ready_path, args.timeout)
+    results = {
+        **git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+    }
+    try:
+        wait_for_port(ollama_port, 10)
+        cold_serving, cold = server.start()
+        print(f"Cold start: serving after {cold_serving:.2f}s, ready after {cold:.2f}s", flush=True)
+        results["ingestion"] = ingest(server, corpus, args.timeout)
+        # The high-water mark is lost with the process, so it is read before the restart
+        results["ingestion"]["peak_rss_mb"] = server.peak_rss_mb()
+        print(f"Ingested {results['ingestion']['chunks']} chunks at {results['ingestion']['chunks_per_s']} chunks/s, "
+              f"peak RSS {results['ingestion']['peak_rss_mb']} MB", flush=True)
+        server.stop()
+
+        warm_serving, warm = server.start()
+        warm_reconciled = server.wait_warm()
+        print(f"Warm start: serving after {warm_serving:.2f}s, ready after {warm:.2f}s, "
+              f"documents reconciled after {warm_reconciled:.2f}s", flush=True)
+        results["startup"] = {
+            "cold_s": round(cold, 3),
+            "warm_s": round(warm, 3),
+            "warm_reconciled_s": round(warm_reconciled, 3),
+            "cold_serving_s": round(cold_serving, 3),
+            "warm_serving_s": round(warm_serving, 3),
+            "profile": httpx.get(f"{server.url}/api/startup").json(),
+        }
+
+        results["queries"] = {}
+        for route in args.routes:
+            items = questions(route, args.queries + args.warmup, args.seed)
+            summary = asyncio.run(load(server, items, args.concurrency, args.warmup, args.cache))
+            results["queries"][route] = summary
+            print(f"{route}: p50 {summary['p50_ms']}ms p95 {summary['p95_ms']}ms, {summary['errors']} errors", flush=True)
+        # Peak of the query server; the ingestion server's is under ingestion.peak_rss_mb
+        results["peak_rss_mb"] = server.peak_rss_mb()
+    finally:
+        server.stop()
+        stop_process(ollama)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or Path(__file__).parent / "results" / f"{datetime.now():%Y%m%d-%H%M%S}-{results['commit'] or 'nogit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 import os
 
 from pathlib import Path
@@ -18,19 +18,97 @@ class Settings(BaseSettings):
     # Paths
     DOCUMENTS_DIR: str = "./data/documents"
     VECTORSTORE_DIR: str = "./data/chroma_db"
+    CATALOG_PATH: str = "./data/catalog.json"
+    LEXICAL_INDEX_PATH: str = "./data/lexical_index.pkl"
+    EMBEDDING_CACHE_DIR: str = "./data/embedding_cache"
     DATABASE_PATH:str = str(BASE_DIR / "data" / "database.db")
     OLLAMA_BASE_URL: str = "http://localhost:11434"
     # LLM Settings
     LLM_MODEL: str = "llama3.1:8b"
     LLM_TEMPERATURE: float = 0.0
+    LLM_POOL_SIZE: int = 4  # Cached clients per (model, temperature); at least the default plus one
+    LLM_KEEP_ALIVE: str = "30m"  # How long Ollama keeps a model loaded after a request
+    LLM_WARMUP: bool = True  # Load a model in the background when its client is first created
+    LLM_HTTP_MAX_CONNECTIONS: int = 16
+    LLM_NUM_CTX: int = 4096  # Context window Ollama runs models with
+    MODEL_CONTEXT_WINDOWS: Dict[str, int] = {}  # Per-model override, e.g. {"llama3.1:8b": 8192}
+    ANSWER_RESERVED_TOKENS: int = 512  # Kept free for the answer when packing context
+    TOKENIZER_DIR: str = "./data/tokenizers"  # <model name>.json Hugging Face tokenizer files
+
+    # DSPy
+    DSPY_PROGRAMS_DIR: str = "./data/dspy_programs"  # Compiled programs saved as <name>.json
+    DSPY_CACHE_DIR: str = "./data/dspy_cache"
+    DSPY_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024
+    DSPY_CACHE_MEMORY_ENTRIES: int = 10000
     EMBEDDING_MODEL: str = "nomic-embed-text:latest"
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_CONCURRENCY: int = 2
+    EMBEDDING_QUERY_CACHE_SIZE: int = 2048
     
     # Chunking
     CHUNK_SIZE: int = 500
     CHUNK_OVERLAP: int = 20
+    DOCUMENT_PAGE_BATCH: int = 16  # Pages (or CSV rows) split together while streaming a file
     
+    # Ingestion
+    INGESTION_WORKERS: int = 2
+    INGESTION_BATCH_SIZE: int = 256
+    INGESTION_JOB_HISTORY: int = 200
+
     # Retrieval
     TOP_K_RESULTS: int = 4
+    RETRIEVAL_MODE: str = "hybrid"  # vector, lexical or hybrid
+    RETRIEVAL_CANDIDATES: int = 20  # Pool per side before fusion, dedupe, rerank and MMR cut it to TOP_K_RESULTS
+    HYBRID_RRF_K: int = 60
+    RETRIEVAL_DEDUPE_SIMILARITY: float = 0.98  # Cosine at which two chunks count as near-duplicates
+    RETRIEVAL_MMR_ENABLED: bool = True
+    RETRIEVAL_MMR_LAMBDA: float = 0.7  # 1.0 = pure relevance, lower = more diverse
+    RERANKER_MODEL: str = ""  # e.g. cross-encoder/ms-marco-MiniLM-L-6-v2, needs sentence-transformers
+
+    # Text-to-SQL
+    SCHEMA_TOKEN_BUDGET: int = 2000
+    SCHEMA_SAMPLE_ROWS: int = 3  # 0 disables sampled values in the schema prompt
+    SCHEMA_PRUNING_ENABLED: bool = True
+    SCHEMA_TOP_K_TABLES: int = 8  # Plus their foreign-key neighbours
+
+    # SQL Execution
+    SQL_TIMEOUT: float = 10.0
+    SQL_MAX_ROWS: int = 1000
+    SQL_MAX_BYTES: int = 1024 * 1024
+    SQL_CONTEXT_ROWS: int = 50  # Larger results are summarized for the LLM
+    SQL_SAMPLE_ROWS: int = 10
+    SQL_RESULT_HISTORY: int = 500
+    SQL_POOL_SIZE: int = 4
+    SQL_POOL_OVERFLOW: int = 4
+    SQL_STATEMENT_CACHE: int = 256
+    SQL_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQL_CACHE_SIZE_KB: int = 64 * 1024
+    SQL_ENABLE_WAL: bool = False  # Opens the file read-write once at startup to switch it to WAL
+    SQL_CACHE_SIZE: int = 512  # Validated generated SQL per (question, tables, schema version, model)
+    SQL_RESULT_CACHE_ENABLED: bool = False
+    SQL_RESULT_CACHE_SIZE: int = 128
+
+    # Query Routing
+    ROUTER_EMBEDDING_ENABLED: bool = True
+    ROUTER_MIN_SIMILARITY: float = 0.55
+    ROUTER_MIN_MARGIN: float = 0.08
+    ROUTER_SINGLE_SOURCE_MIN_SIMILARITY: float = 0.7  # No runner-up to beat, so the floor is higher
+    SPECULATIVE_RETRIEVAL: bool = False  # Search the documents while the query is being classified
+
+    # Answer Cache
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY: float = 0.95
+    ANSWER_CACHE_TTL: float = 3600.0
+    ANSWER_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # Query Execution
+    QUERY_MAX_WORKERS: int = 4
+    QUERY_MAX_QUEUE: int = 16
+    QUERY_TIMEOUT: float = 120.0
+    QUERY_ASYNC: bool = False  # Run queries through Graph.ainvoke instead of the thread pool
+
+    # Startup
+    STARTUP_WAIT_FOR_DOCUMENTS: bool = False  # Report ready only after the documents directory is reconciled
     
     class Config:
         env_file = ".env"
@@ -41,4 +119,9 @@ settings = Settings()
 # Create necessary directories
 os.makedirs(settings.DOCUMENTS_DIR, exist_ok=True)
 os.makedirs(settings.VECTORSTORE_DIR, exist_ok=True)
+os.makedirs(os.path.dirname(settings.CATALOG_PATH), exist_ok=True)
+os.makedirs(os.path.dirname(settings.LEXICAL_INDEX_PATH), exist_ok=True)
+os.makedirs(settings.EMBEDDING_CACHE_DIR, exist_ok=True)
+os.makedirs(settings.DSPY_PROGRAMS_DIR, exist_ok=True)
+os.makedirs(settings.DSPY_CACHE_DIR, exist_ok=True)
 os.makedirs(os.path.dirname(settings.DATABASE_PATH), exist_ok=True)
\ No newline at end of file
@@ -1 +1,6 @@
-from .query_classifier import SmartQueryClassifier
\ No newline at end of file
+def __getattr__(name):
+    # Imported on first use: the classifier pulls in DSPy, which lightweight core modules don't need
+    if name == "SmartQueryClassifier":
+        from .query_classifier import SmartQueryClassifier
+        return SmartQueryClassifier
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
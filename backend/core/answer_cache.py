@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from config import settings
+from services.sql_pool import db_file_mtime
+from utils.helpers import normalize_question
+from utils.logger import logger
+
+
+class AnswerCache:
+    """Semantic LRU + TTL cache of final answers, scoped by model, selection and corpus/DB version"""
+    def __init__(self, max_bytes: int, ttl: float, similarity: float) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.similarity = similarity
+        self.db_path = None
+        self._db_version = None
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.bytes = 0
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped on every invalidation; answers computed across a bump are not stored
+        self.generation = 0
+        self.stale_puts = 0
+
+    def scope(self, config: dict) -> tuple:
+        """Everything besides the question that determines the answer"""
+        return (
+            config.get("model") or settings.LLM_MODEL,
+            tuple(sorted(config.get("selected_files") or [])),
+            tuple(sorted(config.get("selected_tables") or [])),
+        )
+
+    def _check_db_version(self):
+        """Drop everything when the database file has changed on disk"""
+        if not self.db_path:
+            return
+        try:
+            version = (db_file_mtime(self.db_path), os.path.getsize(self.db_path))
+        except OSError:
+            version = None
+        if self._db_version is not None and version != self._db_version:
+            self._clear("database file changed")
+        self._db_version = version
+
+    def _clear(self, reason: str):
+        if self._entries:
+            logger.info(f"Answer cache invalidated ({reason}), dropped {len(self._entries)} entries")
+        self._entries.clear()
+        self.bytes = 0
+        self.invalidations += 1
+        self.generation += 1
+
+    def invalidate(self, reason: str = "documents changed"):
+        with self._lock:
+            self._clear(reason)
+
+    def get(self, question: str, vector, config: dict):
+        """Return a cached result for an identical or sufficiently similar question in the same scope"""
+        scope = self.scope(config)
+        normalized = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            self._check_db_version()
+            candidates = []
+            for entry_id, entry in list(self._entries.items()):
+                if now - entry["created"] > self.ttl:
+                    self._drop(entry_id)
+                    continue
+                if entry["scope"] != scope:
+                    continue
+                if entry["question"] == normalized:
+                    return self._hit(entry_id, 1.0)
+                if vector is not None and entry["vector"] is not None:
+                    candidates.append(entry_id)
+            if candidates:
+                query = self._normalize(vector)
+                scores = np.stack([self._entries[i]["vector"] for i in candidates]) @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity:
+                    self.semantic_hits += 1
+                    return self._hit(candidates[best], float(scores[best]))
+            self.misses += 1
+            return None
+
+    def _hit(self, entry_id: int, similarity: float) -> dict:
+        self.hits += 1
+        self._entries.move_to_end(entry_id)
+        result = json.loads(self._entries[entry_id]["payload"])
+        result["metadata"]["cache"] = "hit"
+        result["metadata"]["cache_similarity"] = round(similarity, 4)
+        return result
+
+    def put(self, question: str, vector, config: dict, result: dict, generation: int = None):
+        """Store a result, evicting least recently used entries past the byte budget
+
+        generation is the value read before the answer was computed; if the cache was invalidated
+        since then the answer may come from the old corpus or database and is dropped.
+        """
+        payload = json.dumps(result, default=str)
+        vector = self._normalize(vector) if vector is not None else None
+        size = len(payload) + (vector.nbytes if vector is not None else 0)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._check_db_version()
+            if generation is not None and generation != self.generation:
+                self.stale_puts += 1
+                return
+            self._entries[self._next_id] = {
+                "scope": self.scope(config),
+                "question": normalize_question(question),
+                "vector": vector,
+                "payload": payload,
+                "size": size,
+                "created": time.time(),
+            }
+            self._next_id += 1
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, entry_id: int):
+        self.bytes -= self._entries.pop(entry_id)["size"]
+
+    def _normalize(self, vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "stale_puts": self.stale_puts,
+        }
@@ -0,0 +1,88 @@
+from services.sql_results import summarize_result
+from services.token_counter import get_token_counter, context_window
+from config import settings
+from utils.logger import logger
+
+
+def citation(doc) -> dict:
+    """Source of a chunk; loader pages are 0-based, citations are 1-based"""
+    page = doc.metadata.get("page")
+    return {
+        "filename": doc.metadata.get("filename"),
+        "page": page + 1 if isinstance(page, int) else None,
+    }
+
+
+class ContextBuilder:
+    """Packs retrieved chunks or SQL rows into the prompt up to the model's token budget"""
+    def __init__(self, llm_services) -> None:
+        self.llm_services = llm_services
+
+    def _budget(self, question: str, config: dict):
+        model = config.get("model") or settings.LLM_MODEL
+        counter = get_token_counter(model)
+        window = context_window(model)
+        prompt = counter.count(self.llm_services._format_prompt(question, ""))
+        # Parallel branches of a hybrid query each get their share of the same prompt
+        budget = max(int((window - prompt - settings.ANSWER_RESERVED_TOKENS) * config.get("context_share", 1.0)), 0)
+        return counter, window, budget
+
+    def _metadata(self, counter, window: int, budget: int, used: int, packed: int, dropped: int) -> dict:
+        if dropped:
+            logger.info(f"Context budget {budget} tokens: packed {packed} items, dropped {dropped}")
+        return {
+            "context_tokens": used,
+            "context_budget": budget,
+            "context_window": window,
+            "context_items": packed,
+            "context_dropped": dropped,
+            "context_tokens_exact": counter.exact,
+        }
+
+    def build_documents(self, docs: list, question: str, config: dict):
+        """Highest-ranked chunks first, each under a [n] filename, page header, until the budget is spent"""
+        counter, window, budget = self._budget(question, config)
+        blocks, sources, used = [], [], 0
+        for doc in docs:
+            source = citation(doc)
+            header = f"[{len(blocks) + 1}] {source['filename']}" + (f", page {source['page']}" if source["page"] else "")
+            block = f"{header}\n{doc.page_content}"
+            cost = counter.count(block) + 2
+            if used + cost > budget:
+                if blocks:
+                    continue
+                # Not even the best chunk fits: keep as much of it as the budget allows
+                block = counter.truncate(block, budget)
+                cost = counter.count(block)
+            blocks.append(block)
+            sources.append(source)
+            used += cost
+        metadata = self._metadata(counter, window, budget, used, len(blocks), len(docs) - len(blocks))
+        metadata["sources"] = sources
+        return "\n\n".join(blocks), metadata
+
+    def build_sql(self, sql_query: str, result: dict, question: str, config: dict):
+        """The usual result summary when it fits, otherwise as many rows as the budget allows"""
+        counter, window, budget = self._budget(question, config)
+        header = f"\nSQL query: {sql_query}\n\nSQL Result: "
+        context = header + summarize_result(result, settings.SQL_CONTEXT_ROWS, settings.SQL_SAMPLE_ROWS)
+        used = counter.count(context)
+        rows = result["rows"]
+        if used <= budget:
+            return context, self._metadata(counter, window, budget, used, len(rows), 0)
+
+        total = result["total_count"] if result["total_count"] is not None else f"more than {len(rows)}"
+        lines = [header, f"Columns: {', '.join(result['columns'])}", f"Rows: {total} in total"]
+        used = counter.count("\n".join(lines))
+        packed = 0
+        for row in rows:
+            line = str(row)
+            cost = counter.count(line) + 1
+            if used + cost > budget - 20:
+                break
+            lines.append(line)
+            used += cost
+            packed += 1
+        lines.append(f"... {len(rows) - packed} more fetched rows not shown")
+        context = "\n".join(lines)
+        return context, self._metadata(counter, window, budget, counter.count(context), packed, len(rows) - packed)
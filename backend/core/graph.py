@@ -1,8 +1,21 @@
 from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableLambda
+from langgraph.config import get_stream_writer
 from core.state import GraphState
-from services import LLMServices, SQLService, VectorestoreService, DocumentServices
+from services import LLMServices, SQLService, VectorestoreService, DocumentServices, CatalogService
+from core.context_builder import ContextBuilder
+from config import settings
 from utils.logger import logger
-from core import SmartQueryClassifier
+from core.query_router import QueryRouter
+from utils.metrics import timed_node
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Context counters each hybrid branch reports and merge_contexts sums
+BRANCH_COUNTERS = ("context_tokens", "context_budget", "context_items", "context_dropped")
 
 class Graph:
     """Graph Flow for The RAG System"""
@@ -11,46 +24,176 @@ class Graph:
             llm_services: LLMServices,
             vectorstore_services: VectorestoreService,
             sql_services: SQLService,
-            document_services: DocumentServices
+            document_services: DocumentServices,
+            catalog_services: CatalogService
             ):
         self.llm_services = llm_services
         self.vectorstore_services = vectorstore_services
         self.sql_services = sql_services
         self.document_services = document_services
+        self.catalog_services = catalog_services
+        self.router = QueryRouter(vectorstore_services, sql_services)
+        self.context_builder = ContextBuilder(llm_services)
+        self._speculation_pool = ThreadPoolExecutor(max_workers=settings.QUERY_MAX_WORKERS, thread_name_prefix="speculate")
+        # Speculation is only worth it when it starts right away, so it never queues behind other searches
+        self._speculation_slots = threading.BoundedSemaphore(settings.QUERY_MAX_WORKERS)
         self.graph = None
 
-    def classify_query(self, state: GraphState) -> GraphState:
-        """Classify type of query (document, sql, general)"""
-        question = state["question"]
+    def _classifier_inputs(self, state: GraphState) -> dict:
+        """Collect the question, tables and document titles handed to the classifier"""
         config = state.get("config", {})
         selected_tables = config.get("selected_tables", [])
         selected_files = config.get("selected_files", []) 
-        logger.info("Start Classify User's Query...")
-        classifier = SmartQueryClassifier()
         
         doc_titles = []
         if selected_files:
             doc_titles = selected_files
             logger.info(f"Using selected files for classification: {len(doc_titles)} files")
         else:
-            documents = self.document_services.load_all_documents()
-            doc_titles = [doc.metadata.get('filename', doc.metadata.get('source', 'Unknown')) for doc in documents]
+            doc_titles = self.catalog_services.get_titles()
         
         tables = selected_tables if selected_tables else self.sql_services.get_avaliable_tables()
-        
-        result = classifier(
-            question=question,
-            tables=tables,
-            documents=doc_titles
-        )
+        return {"question": state["question"], "tables": tables, "documents": doc_titles}
+
+    def _set_classification(self, state: GraphState, result: dict) -> GraphState:
         logger.info(f"Classification Finished, Result: {result}")
         state["query_type"] = result['query_type']
-        state["metadata"] = {"confidence": result['confidence'], "reasoning": result['reasoning']}
+        state["metadata"] = {
+            "confidence": result['confidence'],
+            "reasoning": result['reasoning'],
+            "route_tier": result['tier'],
+            "route_ms": result['route_ms']
+        }
         return state
+
+    def _should_speculate(self, state: GraphState, inputs: dict) -> bool:
+        """Speculate only when the document path is possible and not ruled out by the selection"""
+        config = state.get("config", {})
+        if not settings.SPECULATIVE_RETRIEVAL or not inputs["documents"]:
+            return False
+        return not (config.get("selected_tables") and not config.get("selected_files"))
+
+    def _share_embedding(self, state: GraphState, vector) -> GraphState:
+        # Routing, retrieval and schema pruning all read the embedding from the config
+        state["config"] = {**state.get("config", {}), "question_embedding": vector}
+        return state
+
+    def _timed_search(self, question: str, vector, filter_files: list):
+        start = time.perf_counter()
+        docs = self.vectorstore_services.similarity_search(question, filter_files=filter_files, query_embedding=vector)
+        return docs, start, time.perf_counter()
+
+    def _submit_speculation(self, question: str, vector, filter_files: list):
+        """Start the search on an idle worker; None when every worker is busy"""
+        if not self._speculation_slots.acquire(blocking=False):
+            return None
+        # Run in a copy of the request's context so the search still counts toward its timings
+        future = self._speculation_pool.submit(
+            contextvars.copy_context().run, self._timed_search, question, vector, filter_files
+        )
+        future.add_done_callback(lambda _: self._speculation_slots.release())
+        return future
+
+    def _skip_speculation(self, state: GraphState, result: dict) -> GraphState:
+        state = self._set_classification(state, result)
+        state["metadata"]["speculation"] = "skipped"
+        return state
+
+    def _set_speculation(self, state: GraphState, search, classified_at: float) -> GraphState:
+        """Keep the speculative documents when the route needs them and record the overlap"""
+        if state["query_type"] in ("document", "hybrid"):
+            docs, start, end = search
+            state["speculative_docs"] = docs
+            state["metadata"]["speculation"] = "used"
+            state["metadata"]["speculative_retrieval_ms"] = round((end - start) * 1000, 2)
+            # Retrieval time that ran while the classifier was still working
+            state["metadata"]["speculation_hidden_ms"] = round(max(min(end, classified_at) - start, 0) * 1000, 2)
+        else:
+            state["metadata"]["speculation"] = "discarded"
+        return state
+
+    def classify_query(self, state: GraphState) -> GraphState:
+        """Classify type of query (document, sql, general, hybrid)"""
+        logger.info("Start Classify User's Query...")
+        inputs = self._classifier_inputs(state)
+        if not self._should_speculate(state, inputs):
+            result = self.router.route(config=state.get("config", {}), **inputs)
+            return self._set_classification(state, result)
+
+        config = state.get("config", {})
+        try:
+            vector = config.get("question_embedding") or self.vectorstore_services.embedding.embed_query(state["question"])
+        except Exception as e:
+            logger.warning(f"Couldn't embed question for speculative retrieval, routing without it: {e}")
+            return self._skip_speculation(state, self.router.route(config=config, **inputs))
+        state = self._share_embedding(state, vector)
+        future = self._submit_speculation(state["question"], vector, config.get("selected_files", []))
+        result = self.router.route(config=state["config"], **inputs)
+        classified_at = time.perf_counter()
+        if future is None:
+            return self._skip_speculation(state, result)
+        state = self._set_classification(state, result)
+        if state["query_type"] in ("document", "hybrid"):
+            return self._set_speculation(state, future.result(), classified_at)
+        # Not needed on this route: drop it if it hasn't started, otherwise its result is ignored
+        future.cancel()
+        return self._set_speculation(state, None, classified_at)
+
+    async def aclassify_query(self, state: GraphState) -> GraphState:
+        """Async variant of classify_query"""
+        logger.info("Start Classify User's Query...")
+        inputs = self._classifier_inputs(state)
+        if not self._should_speculate(state, inputs):
+            result = await self.router.aroute(config=state.get("config", {}), **inputs)
+            return self._set_classification(state, result)
+
+        config = state.get("config", {})
+        try:
+            vector = config.get("question_embedding") or await self.vectorstore_services.embedding.aembed_query(state["question"])
+        except Exception as e:
+            logger.warning(f"Couldn't embed question for speculative retrieval, routing without it: {e}")
+            return self._skip_speculation(state, await self.router.aroute(config=config, **inputs))
+        state = self._share_embedding(state, vector)
+
+        async def timed_search():
+            start = time.perf_counter()
+            docs = await self.vectorstore_services.asimilarity_search(
+                state["question"], filter_files=config.get("selected_files", []), query_embedding=vector
+            )
+            return docs, start, time.perf_counter()
+
+        task = asyncio.create_task(timed_search())
+        result = await self.router.aroute(config=state["config"], **inputs)
+        classified_at = time.perf_counter()
+        state = self._set_classification(state, result)
+        if state["query_type"] in ("document", "hybrid"):
+            return self._set_speculation(state, await task, classified_at)
+        task.cancel()
+        return self._set_speculation(state, None, classified_at)
     
-    def route_query(self, state: GraphState) -> str:
-        """Route to appropriate node based on query type."""
+    def route_query(self, state: GraphState):
+        """Route to appropriate node based on query type; hybrid fans out to both branches."""
+        if state["query_type"] == "hybrid":
+            return ["hybrid_documents", "hybrid_sql"]
         return state["query_type"]
+
+    def _set_retrieved(self, state: GraphState, docs: list) -> GraphState:
+        if docs:
+            context, metadata = self.context_builder.build_documents(docs, state["question"], state.get("config", {}))
+            state["context"] = context
+            state["metadata"]["retrieved_docs"] = len(docs)
+            state["metadata"].update(metadata)
+            logger.info(f"Retrieved {len(docs)} documents")
+        else:
+            state["context"] = "No relevant documents found."
+            logger.warning("No documents found")
+        return state
+
+    def _set_retrieval_error(self, state: GraphState, e: Exception) -> GraphState:
+        state["error"] = f"Document retrieval error {str(e)}"
+        state["context"] = ""
+        logger.error(f"Error retrieving documents {e}")
+        return state
     
     def retrieve_documents(self, state: GraphState) -> GraphState:
         """retrieve relevant documents"""
@@ -58,18 +201,41 @@ class Graph:
             logger.info("Retrieving documents...")
             config = state.get("config", {})
             filter_files = config.get("selected_files", [])
-            docs = self.vectorstore_services.similarity_search(state["question"], filter_files=filter_files)
-            if docs:
-                state["context"] = "\n\n".join([doc.page_content for doc in docs])
-                state["metadata"]["retrieved_docs"] = len(docs)
-                logger.info(f"Retrieved {len(docs)} documents")
-            else:
-                state["context"] = "No relevant documents found."
-                logger.warning("No documents found")
+            docs = state.get("speculative_docs")
+            if docs is None:
+                docs = self.vectorstore_services.similarity_search(
+                    state["question"], filter_files=filter_files, query_embedding=config.get("question_embedding")
+                )
+            return self._set_retrieved(state, docs)
         except Exception as e:
-            state["error"] = f"Document retrieval error {str(e)}"
-            state["context"] = ""
-            logger.error(f"Error retrieving documents {e}")
+            return self._set_retrieval_error(state, e)
+
+    async def aretrieve_documents(self, state: GraphState) -> GraphState:
+        """Async variant of retrieve_documents"""
+        try:
+            logger.info("Retrieving documents...")
+            config = state.get("config", {})
+            filter_files = config.get("selected_files", [])
+            docs = state.get("speculative_docs")
+            if docs is None:
+                docs = await self.vectorstore_services.asimilarity_search(
+                    state["question"], filter_files=filter_files, query_embedding=config.get("question_embedding")
+                )
+            return self._set_retrieved(state, docs)
+        except Exception as e:
+            return self._set_retrieval_error(state, e)
+
+    def _set_sql_result(self, state: GraphState, sql_query: str, result: dict) -> GraphState:
+        state["sql_query"] = sql_query
+        state["sql_result"] = result["rows"]
+        context, metadata = self.context_builder.build_sql(sql_query, result, state["question"], state.get("config", {}))
+        state["context"] = context
+        state["metadata"].update(metadata)
+        state["metadata"]["sql_result_id"] = result["result_id"]
+        state["metadata"]["sql_truncated"] = result["truncated"]
+        state["metadata"]["sql_total_rows"] = result["total_count"]
+        state["metadata"]["sql_result_cached"] = result["cached"]
+        logger.info("SQL query executed successfully.")
         return state
     
     def query_sql(self, state: GraphState) -> GraphState:
@@ -81,15 +247,41 @@ class Graph:
             
             sql_query = self.sql_services.generate_sql(
                 state["question"], 
-                selected_tables=selected_tables
+                selected_tables=selected_tables,
+                question_embedding=config.get("question_embedding"),
+                metadata=state["metadata"],
+                model=config.get("model")
+            )
+            
+            if sql_query:
+                result = self.sql_services.execute_sql(sql_query=sql_query)
+                self._set_sql_result(state, sql_query, result)
+            else:
+                state["error"] = "Could not generate SQL Query"
+                logger.warning("Failed to generate SQL Query")
+        except Exception as e:
+            state["error"] = f"SQL error {str(e)}"
+            logger.error(f"SQL Error {e}")
+        return state
+
+    async def aquery_sql(self, state: GraphState) -> GraphState:
+        """Async variant of query_sql"""
+        try:
+            logger.info("Generating and executing sql query...")
+            config = state.get("config", {})
+            selected_tables = config.get("selected_tables", [])
+            
+            sql_query = await self.sql_services.agenerate_sql(
+                state["question"], 
+                selected_tables=selected_tables,
+                question_embedding=config.get("question_embedding"),
+                metadata=state["metadata"],
+                model=config.get("model")
             )
             
             if sql_query:
-                state["sql_query"] = sql_query
-                result = self.sql_services.execute_sql_as_dict(sql_query=sql_query)
-                state["sql_result"] = result
-                state["context"] = f"\nSQL query: {sql_query}\n\nSQL Result: {result}"
-                logger.info("SQL query executed successfully.")
+                result = await self.sql_services.aexecute_sql(sql_query=sql_query)
+                self._set_sql_result(state, sql_query, result)
             else:
                 state["error"] = "Could not generate SQL Query"
                 logger.warning("Failed to generate SQL Query")
@@ -98,6 +290,84 @@ class Graph:
             logger.error(f"SQL Error {e}")
         return state
     
+    def _branch_state(self, state: GraphState) -> GraphState:
+        """Private copy of the state for one parallel branch, with half of the context budget"""
+        return {
+            **state,
+            "context": "",
+            "error": "",
+            "metadata": {},
+            "config": {**state.get("config", {}), "context_share": 0.5}
+        }
+
+    def _branch_update(self, name: str, result: GraphState, start: float) -> dict:
+        """Only the keys this branch owns, so both branches can write in the same step"""
+        metadata = result["metadata"]
+        update = {
+            "branch_results": {
+                name: {
+                    "context": result.get("context", ""),
+                    "error": result.get("error", ""),
+                    "start": start,
+                    "end": time.perf_counter(),
+                    **{key: metadata.pop(key, 0) for key in BRANCH_COUNTERS}
+                }
+            },
+            "metadata": metadata
+        }
+        if name == "sql":
+            update["sql_query"] = result.get("sql_query", "")
+            update["sql_result"] = result.get("sql_result", [])
+        return update
+
+    def hybrid_documents(self, state: GraphState) -> dict:
+        """Document branch of a hybrid query"""
+        start = time.perf_counter()
+        return self._branch_update("documents", self.retrieve_documents(self._branch_state(state)), start)
+
+    async def ahybrid_documents(self, state: GraphState) -> dict:
+        start = time.perf_counter()
+        return self._branch_update("documents", await self.aretrieve_documents(self._branch_state(state)), start)
+
+    def hybrid_sql(self, state: GraphState) -> dict:
+        """Database branch of a hybrid query"""
+        start = time.perf_counter()
+        return self._branch_update("sql", self.query_sql(self._branch_state(state)), start)
+
+    async def ahybrid_sql(self, state: GraphState) -> dict:
+        start = time.perf_counter()
+        return self._branch_update("sql", await self.aquery_sql(self._branch_state(state)), start)
+
+    def merge_contexts(self, state: GraphState) -> GraphState:
+        """Join the branch contexts and record how much the branches overlapped"""
+        results = state.get("branch_results", {})
+        sections, errors = [], []
+        for name, title in (("documents", "Documents"), ("sql", "Database")):
+            branch = results.get(name, {})
+            if branch.get("error"):
+                errors.append(branch["error"])
+            elif branch.get("context"):
+                sections.append(f"## {title}\n{branch['context']}")
+        state["context"] = "\n\n".join(sections)
+        if errors and not sections:
+            state["error"] = "; ".join(errors)
+        elif errors:
+            state["metadata"]["branch_errors"] = errors
+
+        branches = list(results.values())
+        state["metadata"]["branch_ms"] = {name: round((b["end"] - b["start"]) * 1000, 2) for name, b in results.items()}
+        state["metadata"]["sequential_ms"] = round(sum(state["metadata"]["branch_ms"].values()), 2)
+        state["metadata"]["parallel_ms"] = round(
+            (max(b["end"] for b in branches) - min(b["start"] for b in branches)) * 1000, 2
+        ) if branches else 0.0
+        for key in BRANCH_COUNTERS:
+            state["metadata"][key] = sum(b.get(key, 0) for b in branches)
+        logger.info(
+            f"Hybrid branches took {state['metadata']['parallel_ms']}ms wall clock "
+            f"({state['metadata']['sequential_ms']}ms if run one after the other)"
+        )
+        return state
+
     def generate_answer(self, state: GraphState) -> GraphState:
         """Generate Final Answer"""
         try:
@@ -106,16 +376,10 @@ class Graph:
                 logger.warning(f"Generating error response: {state['error']}")
                 return state
             logger.info("Generating answer...")
-            question = state["question"]
-            
-            config = state.get("config", {})
-            
-            context = state.get("context", "")
-            
             response = self.llm_services.generate_response(
-                prompt=question,
-                context=context,
-                config=config
+                prompt=state["question"],
+                context=state.get("context", ""),
+                config=state.get("config", {})
             )
             state["answer"] = response
             logger.info("Answer generated successfully.")
@@ -124,9 +388,42 @@ class Graph:
             logger.error(f"Error generating answer: {e}")
         return state
 
-    def invoke(self, question: str, config: dict) -> dict:
-        """Invoke the graph with a question"""
-        initial_state: GraphState = {
+    async def agenerate_answer(self, state: GraphState) -> GraphState:
+        """Async variant of generate_answer"""
+        try:
+            if state.get("error"):
+                state["answer"] = f"I encountered an error: {state['error']}"
+                logger.warning(f"Generating error response: {state['error']}")
+                return state
+            logger.info("Generating answer...")
+            config = state.get("config", {})
+            if config.get("stream"):
+                # Forward tokens to graph.astream(stream_mode="custom") as they arrive
+                writer = get_stream_writer()
+                tokens = []
+                async for token in self.llm_services.astream_response(
+                    prompt=state["question"],
+                    context=state.get("context", ""),
+                    config=config
+                ):
+                    tokens.append(token)
+                    writer({"token": token})
+                response = "".join(tokens)
+            else:
+                response = await self.llm_services.agenerate_response(
+                    prompt=state["question"],
+                    context=state.get("context", ""),
+                    config=config
+                )
+            state["answer"] = response
+            logger.info("Answer generated successfully.")
+        except Exception as e:
+            state["answer"] = f"Error generating answer: {str(e)}"
+            logger.error(f"Error generating answer: {e}")
+        return state
+
+    def _initial_state(self, question: str, config: dict) -> GraphState:
+        return {
             "question": question,
             "query_type": "general",
             "context": "",
@@ -135,19 +432,50 @@ class Graph:
             "answer": "",
             "error": "",
             "config": config,
-            "metadata": {}
+            "metadata": {},
+            "branch_results": {},
+            "speculative_docs": None
         }
-        result = self.graph.invoke(initial_state) if self.graph else {}
+
+    def invoke(self, question: str, config: dict) -> dict:
+        """Invoke the graph with a question"""
+        result = self.graph.invoke(self._initial_state(question, config)) if self.graph else {}
+        return result
+
+    async def ainvoke(self, question: str, config: dict) -> dict:
+        """Invoke the graph with a question, running every node on its async path"""
+        result = await self.graph.ainvoke(self._initial_state(question, config)) if self.graph else {}
         return result
+
+    async def astream(self, question: str, config: dict):
+        """Stream the graph run, yielding (node name, state) after each node and ("token", text) while answering"""
+        if not self.graph:
+            return
+        initial_state = self._initial_state(question, {**config, "stream": True})
+        async for mode, chunk in self.graph.astream(initial_state, stream_mode=["updates", "custom"]):
+            if mode == "custom":
+                yield "token", chunk["token"]
+            else:
+                for node, update in chunk.items():
+                    yield node, update
     
     def build(self):
         """Build langgraph workflow"""
         workflow = StateGraph(GraphState)
 
-        workflow.add_node("classify_query", self.classify_query)
-        workflow.add_node("retrieve_documents", self.retrieve_documents)
-        workflow.add_node("query_sql", self.query_sql)
-        workflow.add_node("generate_answer", self.generate_answer)
+        # Each node carries both paths: graph.invoke runs the sync one, graph.ainvoke the async one
+        nodes = {
+            "classify_query": (self.classify_query, self.aclassify_query),
+            "retrieve_documents": (self.retrieve_documents, self.aretrieve_documents),
+            "query_sql": (self.query_sql, self.aquery_sql),
+            "hybrid_documents": (self.hybrid_documents, self.ahybrid_documents),
+            "hybrid_sql": (self.hybrid_sql, self.ahybrid_sql),
+            "merge_contexts": (self.merge_contexts, None),
+            "generate_answer": (self.generate_answer, self.agenerate_answer),
+        }
+        for name, (func, afunc) in nodes.items():
+            afunc = timed_node(name, afunc) if afunc else None
+            workflow.add_node(name, RunnableLambda(timed_node(name, func), afunc=afunc))
 
         workflow.set_entry_point("classify_query")
 
@@ -156,9 +484,14 @@ class Graph:
             {
                 "document": "retrieve_documents",
                 "sql": "query_sql",
-                "general": "generate_answer"
+                "general": "generate_answer",
+                # Hybrid questions run both branches concurrently
+                "hybrid_documents": "hybrid_documents",
+                "hybrid_sql": "hybrid_sql"
             }
             )
+        workflow.add_edge(["hybrid_documents", "hybrid_sql"], "merge_contexts")
+        workflow.add_edge("merge_contexts", "generate_answer")
         workflow.add_edge("retrieve_documents", "generate_answer")
         workflow.add_edge("query_sql", "generate_answer")
         workflow.add_edge("generate_answer", END)
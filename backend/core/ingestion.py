@@ -0,0 +1,91 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from utils.logger import logger
+
+
+class IngestionJob:
+    """Progress of one parse -> split -> embed -> upsert run"""
+    def __init__(self, filename: str) -> None:
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.status = "queued"
+        self.pages_parsed = 0
+        self.chunks_embedded = 0
+        self.error = ""
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def update(self, pages_parsed: int = None, chunks_embedded: int = None):
+        if pages_parsed is not None:
+            self.pages_parsed = pages_parsed
+        if chunks_embedded is not None:
+            self.chunks_embedded = chunks_embedded
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "pages_parsed": self.pages_parsed,
+            "chunks_embedded": self.chunks_embedded,
+            "elapsed_seconds": round(elapsed, 2),
+            "chunks_per_second": round(self.chunks_embedded / elapsed, 2) if elapsed else 0.0,
+            "queued_seconds": round((self.started_at or end) - self.created_at, 2),
+            "error": self.error,
+        }
+
+
+class IngestionQueue:
+    """Background worker pool that indexes uploaded files with bounded concurrency"""
+    def __init__(self, worker, max_workers: int, history: int) -> None:
+        self.worker = worker
+        self.history = history
+        self.jobs: OrderedDict = OrderedDict()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._file_locks: dict = {}
+        self._lock = threading.Lock()
+
+    def file_lock(self, filename: str) -> threading.Lock:
+        """Lock held while a file's chunks are written or removed; shared by jobs, deletes and reconciliation"""
+        with self._lock:
+            return self._file_locks.setdefault(filename, threading.Lock())
+
+    def submit(self, filename: str) -> IngestionJob:
+        """Queue a file for indexing and return immediately"""
+        job = IngestionJob(filename)
+        with self._lock:
+            self.jobs[job.id] = job
+            while len(self.jobs) > self.history:
+                self.jobs.popitem(last=False)
+        self._pool.submit(self._run, job, self.file_lock(filename))
+        logger.info(f"Queued ingestion job {job.id} for {filename}")
+        return job
+
+    def _run(self, job: IngestionJob, file_lock: threading.Lock):
+        # Re-uploads of the same file are indexed one after the other, never concurrently
+        with file_lock:
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                self.worker(job.filename, job.update)
+                job.status = "completed"
+                logger.info(f"Ingestion job {job.id} completed: {job.to_dict()}")
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                logger.error(f"Ingestion job {job.id} failed: {e}")
+            finally:
+                job.finished_at = time.time()
+
+    def get(self, job_id: str):
+        job = self.jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
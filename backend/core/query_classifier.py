@@ -1,13 +1,13 @@
 import dspy
 
 class QueryClassifier(dspy.Signature):
-    """Classify user query into SQL, Document, or General Categories based on intent"""
+    """Classify user query into SQL, Document, Hybrid (both), or General Categories based on intent"""
     question = dspy.InputField(desc="User's question")
     available_tables=dspy.InputField(desc="List of avaliable database tables")
     available_documents=dspy.InputField(desc="List of available document titles")
 
     query_type = dspy.OutputField(
-        desc = "Classification: 'sql' for database queires, 'document' fo document-based questions, 'genera' for other questions"
+        desc = "Classification: 'sql' for database queires, 'document' fo document-based questions, 'hybrid' for questions that need both the database and the documents, 'genera' for other questions"
     )
     confidence = dspy.OutputField(desc="Confidence score between 0 and 1")
     reasoning = dspy.OutputField(desc="Breif explaination of classification")
@@ -18,13 +18,23 @@ class SmartQueryClassifier(dspy.Module):
         self.classifier = dspy.ChainOfThought(QueryClassifier)
 
     def forward(self,question:str,tables:list[str],documents:list[str]):
-        result = self.classifier(
-            question=question,
-            available_tables=", ".join(tables) if tables else "None",
-            available_documents=", ".join(documents) if documents else "None"
-        )
+        result = self.classifier(**self._inputs(question, tables, documents))
+        return self._parse(result)
+
+    async def aforward(self,question:str,tables:list[str],documents:list[str]):
+        result = await self.classifier.acall(**self._inputs(question, tables, documents))
+        return self._parse(result)
+
+    def _inputs(self,question:str,tables:list[str],documents:list[str]):
+        return {
+            "question":question,
+            "available_tables":", ".join(tables) if tables else "None",
+            "available_documents":", ".join(documents) if documents else "None"
+        }
+
+    def _parse(self,result):
         query_type = result.query_type.lower().strip()
-        if query_type not in ['sql','document','general']:
+        if query_type not in ['sql','document','general','hybrid']:
             query_type = 'general'
         return {
             "query_type":query_type,
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from utils.logger import logger
+
+
+class ExecutorSaturatedError(Exception):
+    """Raised when every worker is busy and the wait queue is full"""
+
+
+class ExecutorTimeoutError(Exception):
+    """Raised when a request doesn't finish within the configured timeout"""
+
+
+class QueryExecutor:
+    """Bounded worker pool that runs RAG queries off the event loop (or as tasks on it, for the async path)"""
+    def __init__(self, max_workers: int, max_queue: int, timeout: float) -> None:
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rag-query")
+        self._slots = asyncio.Semaphore(max_workers)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def release(self, completed: bool = False):
+        """Free a slot taken by acquire"""
+        self.in_flight -= 1
+        if completed:
+            self.completed += 1
+        self._slots.release()
+
+    def check_admission(self):
+        """Raise ExecutorSaturatedError when a new query would be rejected right now"""
+        if self.in_flight + self.waiting >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise ExecutorSaturatedError(f"Query queue is full ({self.waiting} waiting)")
+
+    async def acquire(self) -> float:
+        """Wait for a free slot, rejecting when the queue is full; returns seconds spent queued"""
+        # Counters are updated before the first await, so admission is decided atomically on the event loop
+        self.check_admission()
+
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise ExecutorTimeoutError(f"Timed out after {self.timeout}s waiting for a free worker")
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        wait = time.perf_counter() - start
+        self.admitted += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        return wait
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn in the pool, waiting for a free worker; returns (result, seconds spent queued)"""
+        wait = await self.acquire()
+        loop = asyncio.get_running_loop()
+        future = self._pool.submit(partial(fn, *args, **kwargs))
+        # The slot is held until the worker thread actually finishes, even if the caller times out,
+        # so the number of running queries never exceeds max_workers
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self.release))
+        try:
+            result = await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)),
+                timeout=max(self.timeout - wait, 0.001)
+            )
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            logger.warning(f"Query exceeded timeout of {self.timeout}s")
+            raise ExecutorTimeoutError(f"Query timed out after {self.timeout}s")
+        self.completed += 1
+        return result, wait
+
+    async def arun(self, coro_fn, *args, **kwargs):
+        """Await a coroutine on the event loop under the same admission limits as run"""
+        wait = await self.acquire()
+        try:
+            result = await asyncio.wait_for(coro_fn(*args, **kwargs), timeout=max(self.timeout - wait, 0.001))
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            logger.warning(f"Query exceeded timeout of {self.timeout}s")
+            raise ExecutorTimeoutError(f"Query timed out after {self.timeout}s")
+        finally:
+            self.release()
+        self.completed += 1
+        return result, wait
+
+    def stats(self) -> dict:
+        """Current queue depth and wait times, used to size the pool"""
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "timeout": self.timeout,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 2) if self.admitted else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
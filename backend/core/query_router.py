@@ -0,0 +1,174 @@
+import time
+import numpy as np
+from pathlib import Path
+from core.query_classifier import SmartQueryClassifier
+from services.dspy_programs import programs
+from config import settings
+from utils.logger import logger
+
+TIERS = ("rules", "embedding", "llm")
+
+
+class QueryRouter:
+    """Tiered query routing: deterministic rules, then embedding similarity, then the DSPy classifier"""
+    def __init__(self, vectorstore_services, sql_services) -> None:
+        self.vectorstore_services = vectorstore_services
+        self.sql_services = sql_services
+        self.classifier = programs.get("query_classifier", SmartQueryClassifier)
+        self._table_vectors: dict = {}
+        self._title_vectors: dict = {}
+        self._schema_version = None
+        self.hits = {tier: 0 for tier in TIERS}
+        self.latency = {tier: 0.0 for tier in TIERS}
+
+    def _route_by_rules(self, tables: list, documents: list, config: dict):
+        """Decide the obvious cases from the user's selection alone"""
+        selected_tables = config.get("selected_tables") or []
+        selected_files = config.get("selected_files") or []
+        if selected_tables and not selected_files:
+            return self._result("sql", 1.0, "Only database tables were selected", "rules")
+        if selected_files and not selected_tables:
+            return self._result("document", 1.0, "Only documents were selected", "rules")
+        if not tables and not documents:
+            return self._result("general", 1.0, "No tables or documents are available", "rules")
+        return None
+
+    def _table_text(self, table: str) -> str:
+        columns = self.sql_services.get_table_schema(table).get("columns", [])
+        return f"{table}: {', '.join(col['name'] for col in columns)}"
+
+    def _title_text(self, title: str) -> str:
+        return Path(title).stem.replace("_", " ").replace("-", " ")
+
+    def _check_schema_version(self):
+        """Forget table embeddings once the database or its schema has changed"""
+        schema_cache = self.sql_services.schema_cache
+        if schema_cache is None:
+            return
+        schema_cache.ensure_fresh()
+        version = (self.sql_services.db_path, schema_cache.schema_version)
+        if version != self._schema_version:
+            self._table_vectors = {}
+            self._schema_version = version
+
+    def _missing(self, tables: list, documents: list):
+        """Texts of tables and titles whose embeddings aren't cached yet"""
+        self._check_schema_version()
+        missing_tables = [t for t in tables if t not in self._table_vectors]
+        missing_titles = [d for d in documents if d not in self._title_vectors]
+        texts = [self._table_text(t) for t in missing_tables] + [self._title_text(d) for d in missing_titles]
+        return missing_tables, missing_titles, texts
+
+    def _store(self, missing_tables: list, missing_titles: list, vectors: list):
+        vectors = [self._normalize(v) for v in vectors]
+        for table, vector in zip(missing_tables, vectors):
+            self._table_vectors[table] = vector
+        for title, vector in zip(missing_titles, vectors[len(missing_tables):]):
+            self._title_vectors[title] = vector
+
+    def _normalize(self, vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _route_by_embedding(self, question_vector, tables: list, documents: list):
+        """Pick the source whose best cosine similarity is both high enough and clearly ahead
+
+        With a single source there is nothing to be ahead of, so only a stricter absolute floor applies;
+        below it the question may be general chit-chat and the LLM classifier decides.
+        """
+        question_vector = self._normalize(question_vector)
+        scores = {}
+        if tables:
+            scores["sql"] = float(np.max(np.stack([self._table_vectors[t] for t in tables]) @ question_vector))
+        if documents:
+            scores["document"] = float(np.max(np.stack([self._title_vectors[d] for d in documents]) @ question_vector))
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best_type, best_score = ranked[0]
+        if len(ranked) == 1:
+            if best_score >= settings.ROUTER_SINGLE_SOURCE_MIN_SIMILARITY:
+                return self._result(best_type, best_score, f"Embedding similarity {best_score:.2f}", "embedding")
+            return None
+        runner_up = ranked[1][1]
+        if best_score >= settings.ROUTER_MIN_SIMILARITY and best_score - runner_up >= settings.ROUTER_MIN_MARGIN:
+            return self._result(
+                best_type, best_score,
+                f"Embedding similarity {best_score:.2f} vs {runner_up:.2f}", "embedding"
+            )
+        return None
+
+    def _result(self, query_type: str, confidence: float, reasoning: str, tier: str) -> dict:
+        return {"query_type": query_type, "confidence": confidence, "reasoning": reasoning, "tier": tier}
+
+    def _record(self, result: dict, start: float) -> dict:
+        elapsed = time.perf_counter() - start
+        self.hits[result["tier"]] += 1
+        self.latency[result["tier"]] += elapsed
+        result["route_ms"] = round(elapsed * 1000, 2)
+        logger.info(f"Routed by {result['tier']} tier in {result['route_ms']}ms: {result['query_type']}")
+        return result
+
+    def route(self, question: str, tables: list, documents: list, config: dict) -> dict:
+        """Route a query, only calling the LLM classifier when the cheaper tiers are unsure"""
+        start = time.perf_counter()
+        result = self._route_by_rules(tables, documents, config)
+        if result:
+            return self._record(result, start)
+
+        embedding = self.vectorstore_services.embedding
+        if settings.ROUTER_EMBEDDING_ENABLED and embedding:
+            try:
+                missing_tables, missing_titles, texts = self._missing(tables, documents)
+                if texts:
+                    self._store(missing_tables, missing_titles, embedding.embed_documents(texts))
+                question_vector = config.get("question_embedding") or embedding.embed_query(question)
+                result = self._route_by_embedding(question_vector, tables, documents)
+                if result:
+                    return self._record(result, start)
+            except Exception as e:
+                logger.warning(f"Embedding routing failed, falling back to LLM classifier: {e}")
+
+        with programs.context(config.get("model")):
+            result = self.classifier(question=question, tables=tables, documents=documents)
+        result["tier"] = "llm"
+        return self._record(result, start)
+
+    async def aroute(self, question: str, tables: list, documents: list, config: dict) -> dict:
+        """Async variant of route"""
+        start = time.perf_counter()
+        result = self._route_by_rules(tables, documents, config)
+        if result:
+            return self._record(result, start)
+
+        embedding = self.vectorstore_services.embedding
+        if settings.ROUTER_EMBEDDING_ENABLED and embedding:
+            try:
+                missing_tables, missing_titles, texts = self._missing(tables, documents)
+                if texts:
+                    self._store(missing_tables, missing_titles, await embedding.aembed_documents(texts))
+                question_vector = config.get("question_embedding") or await embedding.aembed_query(question)
+                result = self._route_by_embedding(question_vector, tables, documents)
+                if result:
+                    return self._record(result, start)
+            except Exception as e:
+                logger.warning(f"Embedding routing failed, falling back to LLM classifier: {e}")
+
+        with programs.context(config.get("model")):
+            result = await self.classifier.acall(question=question, tables=tables, documents=documents)
+        result["tier"] = "llm"
+        return self._record(result, start)
+
+    def stats(self) -> dict:
+        """Per-tier hit counts, hit rates and average latency"""
+        total = sum(self.hits.values())
+        return {
+            "total": total,
+            "tiers": {
+                tier: {
+                    "hits": self.hits[tier],
+                    "hit_rate": round(self.hits[tier] / total, 4) if total else 0.0,
+                    "avg_ms": round(self.latency[tier] / self.hits[tier] * 1000, 2) if self.hits[tier] else 0.0,
+                }
+                for tier in TIERS
+            }
+        }
@@ -1,6 +1,14 @@
 from core.graph import Graph
-from services import LLMServices,VectorestoreService,DocumentServices,SQLService
+from core.answer_cache import AnswerCache
+from core.ingestion import IngestionQueue
+from services import LLMServices,VectorestoreService,DocumentServices,SQLService,CatalogService
+from services.vectorstore_service import make_chunk_id
+from config import settings
 from utils.logger import logger
+from utils.metrics import track_request, observe_query, stats_collector
+from utils.startup import startup
+from pathlib import Path
+import time
 
 class RAG:
     """Main RAG Sysetm"""
@@ -9,28 +17,47 @@ class RAG:
         self.vectorstore_service = VectorestoreService()
         self.document_service = DocumentServices()
         self.sql_service = SQLService()
+        self.catalog_service = CatalogService()
+        self.answer_cache = AnswerCache(
+            max_bytes=settings.ANSWER_CACHE_MAX_BYTES,
+            ttl=settings.ANSWER_CACHE_TTL,
+            similarity=settings.ANSWER_CACHE_SIMILARITY
+        )
+        self.ingestion_queue = IngestionQueue(
+            worker=lambda filename, progress: self.add_document(str(Path(settings.DOCUMENTS_DIR) / filename), progress),
+            max_workers=settings.INGESTION_WORKERS,
+            history=settings.INGESTION_JOB_HISTORY
+        )
         self.graph = None
         self.initialized = False
 
     def setup(self):
-        """Initialize all services and build the graph"""
+        """Initialize all services and build the graph; documents are reconciled afterwards by warm()"""
         try:
             logger.info("="*50)
             logger.info("Starting RAG System Setup")
             logger.info("="*50)
 
-            self.llm_service.intialize()
-            self.vectorstore_service.initialize()
-            self.sql_service.initialize()
-
-            self._load_initial_documents()
-            self.graph = Graph(
-                self.llm_service,
-                self.vectorstore_service,
-                self.sql_service,
-                self.document_service
-            )
-            self.graph.build()
+            with startup.service("llm"):
+                self.llm_service.intialize()
+            with startup.service("vectorstore"):
+                self.vectorstore_service.initialize()
+            with startup.service("sql"):
+                self.sql_service.initialize(embedding=self.vectorstore_service.embedding)
+            with startup.service("catalog"):
+                self.catalog_service.initialize()
+            self.answer_cache.db_path = self.sql_service.db_path
+            self._register_stats()
+
+            with startup.service("graph"):
+                self.graph = Graph(
+                    self.llm_service,
+                    self.vectorstore_service,
+                    self.sql_service,
+                    self.document_service,
+                    self.catalog_service
+                )
+                self.graph.build()
             self.initialized = True
             logger.info("="*50)
             logger.info("RAG System Setup Completed")
@@ -39,35 +66,202 @@ class RAG:
             logger.error(f"Failed to setup RAG System: {e}")
             raise
 
+    def warm(self):
+        """Reconcile the documents directory with the vector store while queries are already served"""
+        with startup.service("documents"):
+            if self._load_initial_documents():
+                self.answer_cache.invalidate("documents reconciled at startup")
+
+    def _register_stats(self):
+        """Cache hit rates, pool usage and routing counters exported on /metrics"""
+        stats_collector.register("answer_cache", self.answer_cache.stats)
+        stats_collector.register("embedding_cache", lambda: self.vectorstore_service.embedding.stats())
+        stats_collector.register("sql_cache", self.sql_service.cache_stats)
+        stats_collector.register("sql_pool", lambda: self.sql_service.pool.stats())
+        stats_collector.register("retrieval", self.vectorstore_service.stats)
+        stats_collector.register("router", lambda: self.graph.router.stats())
+        stats_collector.register("llm", self.llm_service.stats)
+
     def _load_initial_documents(self):
-        """load and index any existing documents"""
-        try:
-            documents = self.document_service.load_all_documents()
-            if documents:
-                chunks = self.document_service.split_documents(documents)
-                self.vectorstore_service.add_documents(chunks)
-                logger.info(f"Indexed {len(chunks)} document chunks")
-        except Exception as e:
-            logger.warning(f"Couldn't load initial documents: {e}")
+        """Reconcile the documents directory with the vector store, embedding only new or changed files"""
+        titles = self.catalog_service.get_titles()
+        self.vectorstore_service.delete_orphaned_documents(keep_filenames=titles)
+        total_chunks = 0
+        skipped = 0
+        for filename in titles:
+            # Uploads and deletes may run while this reconciles, so each file is checked and indexed under its lock
+            with self.ingestion_queue.file_lock(filename):
+                entry = self.catalog_service.get(filename)
+                if not entry:
+                    continue
+                if self.vectorstore_service.is_indexed(filename, entry["content_hash"], entry["chunks"]):
+                    skipped += 1
+                    continue
+                try:
+                    total_chunks += self._index_file(str(Path(settings.DOCUMENTS_DIR) / filename))
+                except Exception as e:
+                    logger.warning(f"Couldn't load initial document {filename}: {e}")
+        logger.info(f"Indexed {total_chunks} document chunks, {skipped} documents already up to date")
+        return total_chunks
+
+    def _index_file(self,file_path:str,progress=None)->int:
+        """Stream a single file through parse -> split -> embed -> upsert in fixed-size batches"""
+        filename = Path(file_path).name
+        entry = self.catalog_service.get(filename) or self.catalog_service.upsert(filename)
+        pages = 0
+        chunk_count = 0
+        indexed_ids = []
+        for pages, chunks in self.document_service.iter_chunk_batches(file_path, settings.INGESTION_BATCH_SIZE):
+            ids = []
+            for chunk in chunks:
+                chunk.metadata["content_hash"] = entry["content_hash"]
+                chunk.metadata["chunk_index"] = chunk_count
+                ids.append(make_chunk_id(filename, entry["content_hash"], chunk_count))
+                chunk_count += 1
+            self.vectorstore_service.add_documents(chunks, ids=ids)
+            indexed_ids.extend(ids)
+            if progress:
+                progress(pages_parsed=pages, chunks_embedded=chunk_count)
+        self.vectorstore_service.flush()
+        # The previous version stays searchable until the new one is fully stored; if a batch fails
+        # the file isn't marked complete and the next reconcile retries it
+        self.vectorstore_service.delete_stale_chunks(filename, indexed_ids)
+        self.catalog_service.set_counts(filename, pages=pages, chunks=chunk_count)
+        logger.info(f"Indexed {chunk_count} chunks from {pages} pages of {filename}")
+        return chunk_count
 
-    def add_document(self,file_path:str):
+    def add_document(self,file_path:str,progress=None):
         """Add new document to the system"""
         try:
-            documents = self.document_service.load_document(file_path)
-            chunks = self.document_service.split_documents(documents=documents)
-            self.vectorstore_service.add_documents(chunks)
+            self.catalog_service.upsert(Path(file_path).name)
+            self._index_file(file_path, progress=progress)
+            self.answer_cache.invalidate("document indexed")
             logger.info(f"Document Added {file_path}")
         except Exception as e:
             logger.error(f"Error adding document: {e}")
             raise
 
+    def remove_document(self,filename:str):
+        """Drop a deleted file from the catalog and the vector store, after any indexing of it finishes"""
+        with self.ingestion_queue.file_lock(filename):
+            self.catalog_service.remove(filename)
+            self.answer_cache.invalidate("document deleted")
+            self.vectorstore_service.delete_documents_by_filename(filename)
+        logger.info(f"Deleted embeddings for: {filename}")
+
+    def _embed_question(self,question:str):
+        try:
+            return self.vectorstore_service.embedding.embed_query(question)
+        except Exception as e:
+            logger.warning(f"Couldn't embed question for caching: {e}")
+            return None
+
+    async def _aembed_question(self,question:str):
+        try:
+            return await self.vectorstore_service.embedding.aembed_query(question)
+        except Exception as e:
+            logger.warning(f"Couldn't embed question for caching: {e}")
+            return None
+
+    def _use_cache(self,config:dict)->bool:
+        if not settings.ANSWER_CACHE_ENABLED:
+            return False
+        if config.get("no_cache"):
+            self.answer_cache.bypassed += 1
+            return False
+        return True
+
+    def _cache_result(self,question:str,vector,config:dict,result:dict,generation:int)->dict:
+        formatted = self._format_result(result)
+        if not result.get("error"):
+            self.answer_cache.put(question, vector, config, formatted, generation=generation)
+        formatted["metadata"]["cache"] = "miss"
+        return formatted
+
+    def _with_timings(self,result:dict,summary:dict,query_type:str=None)->dict:
+        """Attach the per-request latency/token breakdown and feed the end-to-end histogram"""
+        result["metadata"]["timings"] = summary
+        observe_query(query_type or result.get("query_type"), summary["total_ms"] / 1000)
+        return result
+
     def query(self,question:str,config: dict = {})->dict:
         """Query The RAG System"""
+        with track_request() as summary:
+            result = self._query(question, config)
+        return self._with_timings(result, summary)
+
+    async def aquery(self,question:str,config: dict = {})->dict:
+        """Query The RAG System through the async graph path"""
+        with track_request() as summary:
+            result = await self._aquery(question, config)
+        return self._with_timings(result, summary)
+
+    def _query(self,question:str,config: dict)->dict:
         if not self.initialized:
             raise RuntimeError("RAG System not initialized. Call Setup() first")
         logger.info(f"Processing query: {question}")
-        inputs = {"question": question, "config": config}
-        result = self.graph.invoke(question,config) if self.graph else {}
+        if not self._use_cache(config):
+            result = self.graph.invoke(question,config) if self.graph else {}
+            return self._format_result(result)
+        vector = self._embed_question(question)
+        cached = self.answer_cache.get(question, vector, config)
+        if cached:
+            logger.info("Answer served from cache")
+            return cached
+        generation = self.answer_cache.generation
+        # The router reuses the question embedding instead of computing it again
+        result = self.graph.invoke(question,{**config,"question_embedding":vector}) if self.graph else {}
+        return self._cache_result(question, vector, config, result, generation)
+
+    async def _aquery(self,question:str,config: dict)->dict:
+        if not self.initialized:
+            raise RuntimeError("RAG System not initialized. Call Setup() first")
+        logger.info(f"Processing query: {question}")
+        if not self._use_cache(config):
+            result = await self.graph.ainvoke(question,config) if self.graph else {}
+            return self._format_result(result)
+        vector = await self._aembed_question(question)
+        cached = self.answer_cache.get(question, vector, config)
+        if cached:
+            logger.info("Answer served from cache")
+            return cached
+        generation = self.answer_cache.generation
+        result = await self.graph.ainvoke(question,{**config,"question_embedding":vector}) if self.graph else {}
+        return self._cache_result(question, vector, config, result, generation)
+
+    async def astream(self,question:str,config: dict = {}):
+        """Stream node updates and answer tokens for a query"""
+        if not self.initialized:
+            raise RuntimeError("RAG System not initialized. Call Setup() first")
+        logger.info(f"Processing streamed query: {question}")
+        with track_request() as summary:
+            start = time.perf_counter()
+            use_cache = self._use_cache(config)
+            vector = None
+            if use_cache:
+                vector = await self._aembed_question(question)
+                cached = self.answer_cache.get(question, vector, config)
+                if cached:
+                    logger.info("Answer served from cache")
+                    summary["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+                    yield "generate_answer", self._with_timings(cached, summary)
+                    return
+                config = {**config,"question_embedding":vector}
+            generation = self.answer_cache.generation
+            query_type = None
+            async for node, update in self.graph.astream(question,config):
+                if node != "token":
+                    query_type = update.get("query_type") or query_type
+                if node == "generate_answer":
+                    if use_cache:
+                        update = {**update,**self._cache_result(question, vector, config, update, generation)}
+                    # The answer is the last update, so the breakdown is complete at this point
+                    summary["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+                    update = {**update, "metadata": {**update.get("metadata", {})}}
+                    update = self._with_timings(update, dict(summary), query_type)
+                yield node, update
+
+    def _format_result(self,result:dict)->dict:
         return {
             "answer":result["answer"],
             "query_type":result["query_type"],
@@ -1,12 +1,20 @@
-from typing import Literal,Dict,TypedDict,List
+from typing import Annotated,Literal,Dict,TypedDict,List,Optional
+
+
+def merge_dicts(left: Dict, right: Dict) -> Dict:
+    """Reducer that lets parallel branches each add their own keys"""
+    return {**(left or {}), **(right or {})}
+
 
 class GraphState(TypedDict):
     question:str
-    query_type: Literal["document","sql","general"]
+    query_type: Literal["document","sql","general","hybrid"]
     context:str
     sql_query:str
     sql_result:List[Dict]
     answer:str
     error:str
     config: Dict
-    metadata:Dict
\ No newline at end of file
+    metadata:Annotated[Dict, merge_dicts]
+    branch_results:Annotated[Dict, merge_dicts]  # Per-branch context, error and timing of a hybrid query
+    speculative_docs:Optional[List]  # Documents retrieved while the query was being classified
@@ -1,21 +1,56 @@
+from utils.startup import startup
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from utils.logger import logger
 from config import settings
-from api.routes import router,set_rag_system
-from core.rag_system import RAG
+from api.routes import router,set_rag_system,set_query_executor
+from core.query_executor import QueryExecutor
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+import threading
 
-rag_system = RAG()
+# Created by the warm-up thread; LangChain, LangGraph, DSPy and Chroma are only imported there
+rag_system = None
+
+
+def warm_up(query_executor: QueryExecutor):
+    """Import and initialize the RAG system while the server is already accepting requests"""
+    global rag_system
+    try:
+        startup.import_modules()
+        from core.rag_system import RAG
+        from utils.metrics import stats_collector
+        rag_system = RAG()
+        rag_system.setup()
+        stats_collector.register("query_executor", query_executor.stats)
+        if settings.STARTUP_WAIT_FOR_DOCUMENTS:
+            rag_system.warm()
+        set_query_executor(query_executor)
+        set_rag_system(rag_system)
+        startup.mark("ready")
+        if not settings.STARTUP_WAIT_FOR_DOCUMENTS:
+            rag_system.warm()
+        startup.mark("warm")
+    except Exception as e:
+        logger.error(f"RAG System failed to start: {e}")
+        startup.fail(e)
 
 
 @asynccontextmanager
 async def lifespan(app:FastAPI):
     logger.info("RAG System Started...")
-    rag_system.setup()
-    set_rag_system(rag_system)
+    query_executor = QueryExecutor(
+        max_workers=settings.QUERY_MAX_WORKERS,
+        max_queue=settings.QUERY_MAX_QUEUE,
+        timeout=settings.QUERY_TIMEOUT
+    )
+    threading.Thread(target=warm_up, args=(query_executor,), name="rag-warm-up", daemon=True).start()
+    startup.mark("serving")
     yield
+    query_executor.shutdown()
+    if rag_system:
+        rag_system.ingestion_queue.shutdown()
     logger.info("RAG System Closed!")
 
 
@@ -49,7 +84,17 @@ def root():
             "query":"/api/query",
             "upload":"/api/upload",
             "health":"/api/health",
-            "documents":"/api/documents"
+            "live":"/api/live",
+            "ready":"/api/ready",
+            "startup":"/api/startup",
+            "documents":"/api/documents",
+            "jobs":"/api/jobs/{job_id}",
+            "metrics":"/metrics"
         }
     })
 
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics: node/service latency histograms, token counters, cache and pool stats"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
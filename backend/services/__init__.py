@@ -1,4 +1,17 @@
-from .sql_services import SQLService
-from .llm_service import LLMServices
-from .document_services import DocumentServices
-from .vectorstore_service import VectorestoreService
\ No newline at end of file
+import importlib
+
+# Service classes load their heavy dependencies (LangChain, Chroma, DSPy) on first access,
+# so importing one light submodule doesn't import all of them
+_SERVICES = {
+    "SQLService": ".sql_services",
+    "LLMServices": ".llm_service",
+    "DocumentServices": ".document_services",
+    "VectorestoreService": ".vectorstore_service",
+    "CatalogService": ".catalog_service",
+}
+
+
+def __getattr__(name):
+    if name not in _SERVICES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_SERVICES[name], __name__), name)
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+from config import settings
+from utils.helpers import is_valid_document
+from utils.logger import logger
+
+
+def compute_file_hash(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """Compute the sha256 of a file without loading it fully into memory"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CatalogService:
+    """Persisted index of the documents directory (filename, size, mtime, hash, pages, chunks)"""
+    def __init__(self) -> None:
+        self.catalog_path = settings.CATALOG_PATH
+        self.entries: Dict[str, dict] = {}
+        self._lock = threading.RLock()
+
+    def initialize(self):
+        """Load the catalog from disk and reconcile it with the documents directory"""
+        try:
+            if os.path.exists(self.catalog_path):
+                with open(self.catalog_path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f).get("documents", {})
+                logger.info(f"Loaded document catalog with {len(self.entries)} entries")
+            self.scan()
+        except Exception as e:
+            logger.error(f"Failed to initialize document catalog {e}")
+            self.entries = {}
+            self.scan()
+
+    def _save(self):
+        """Atomically write the catalog to disk"""
+        tmp_path = f"{self.catalog_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"documents": self.entries}, f, indent=2)
+        os.replace(tmp_path, self.catalog_path)
+
+    def _stat_entry(self, path: Path, previous: Optional[dict] = None) -> dict:
+        """Build a catalog entry, re-hashing only when size or mtime changed"""
+        stat = path.stat()
+        if previous and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime:
+            return previous
+        content_hash = compute_file_hash(str(path))
+        unchanged = previous and previous["content_hash"] == content_hash
+        return {
+            "filename": path.name,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "content_hash": content_hash,
+            "pages": previous["pages"] if unchanged else 0,
+            "chunks": previous["chunks"] if unchanged else 0,
+        }
+
+    def scan(self) -> dict:
+        """Reconcile the catalog with the files in the documents directory"""
+        with self._lock:
+            docs_path = Path(settings.DOCUMENTS_DIR)
+            seen = set()
+            changed = []
+            for file_path in docs_path.glob("*"):
+                if not file_path.is_file() or not is_valid_document(file_path.name):
+                    continue
+                seen.add(file_path.name)
+                previous = self.entries.get(file_path.name)
+                try:
+                    entry = self._stat_entry(file_path, previous)
+                except OSError as e:
+                    logger.error(f"Failed to catalog {file_path}: {e}")
+                    continue
+                if entry is not previous:
+                    self.entries[file_path.name] = entry
+                    changed.append(file_path.name)
+            removed = [name for name in self.entries if name not in seen]
+            for name in removed:
+                del self.entries[name]
+            if changed or removed:
+                self._save()
+            logger.info(f"Catalog scan finished: {len(self.entries)} documents, "
+                        f"{len(changed)} new/changed, {len(removed)} removed")
+            return {"changed": changed, "removed": removed}
+
+    def upsert(self, filename: str) -> dict:
+        """Add or refresh the entry for a file in the documents directory"""
+        with self._lock:
+            path = Path(settings.DOCUMENTS_DIR) / filename
+            entry = self._stat_entry(path, self.entries.get(filename))
+            self.entries[filename] = entry
+            self._save()
+            return entry
+
+    def set_counts(self, filename: str, pages: int, chunks: int):
+        """Record page and chunk counts once a file has been indexed"""
+        with self._lock:
+            entry = self.entries.get(filename)
+            if not entry:
+                return
+            entry["pages"] = pages
+            entry["chunks"] = chunks
+            self._save()
+
+    def remove(self, filename: str):
+        """Remove a file from the catalog"""
+        with self._lock:
+            if self.entries.pop(filename, None) is not None:
+                self._save()
+
+    def get(self, filename: str) -> Optional[dict]:
+        return self.entries.get(filename)
+
+    def get_titles(self) -> List[str]:
+        """Get the filenames of all cataloged documents"""
+        return list(self.entries)
+
+    def list_documents(self) -> List[dict]:
+        """Get all catalog entries"""
+        return list(self.entries.values())
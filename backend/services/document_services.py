@@ -1,7 +1,6 @@
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader,TextLoader,CSVLoader
-from langchain_classic.schema import Document
-from typing import List
+from langchain_core.documents import Document
+from typing import Iterator, List, Tuple
 from config import settings
 from utils.logger import logger
 from pathlib import Path
@@ -15,29 +14,58 @@ class DocumentServices:
             length_function=len
         )
 
+    def _get_loader(self,path:Path):
+        # Loaders (and the PDF parsing stack) are imported with the first document that needs them
+        from langchain_community.document_loaders import PyPDFLoader,TextLoader,CSVLoader
+        if path.suffix == ".pdf":
+            return PyPDFLoader(str(path))
+        elif path.suffix in [".txt",".md"]:
+            return TextLoader(str(path))
+        elif path.suffix == ".csv":
+            return CSVLoader(str(path))
+        raise ValueError(f"Unsupported file type: {path.suffix}")
+
+    def lazy_load_document(self,file_path:str)->Iterator[Document]:
+        """Yield a document page by page (row by row for CSV) instead of materializing it"""
+        path = Path(file_path)
+        if not path.exists():
+            raise FileNotFoundError(f"File not found {file_path}")
+        for doc in self._get_loader(path).lazy_load():
+            doc.metadata["filename"] = path.name
+            yield doc
+
     def load_document(self,file_path:str)->List[Document]:
         """Load a single document"""
         try:
-            path = Path(file_path)
-            logger.info(f"Loading Document {path.name}")
-            if not path.exists():
-                raise FileNotFoundError(f"File not found {file_path}")
-            if path.suffix == ".pdf":
-                loader = PyPDFLoader(str(path))
-            elif path.suffix in [".txt",".md"]:
-                loader = TextLoader(str(path))
-            elif path.suffix == ".csv":
-                loader = CSVLoader(str(path))
-            else:
-                raise ValueError(f"Unsupported file type: {path.suffix}")
-            documents = loader.load()
-            for doc in documents:
-                doc.metadata["filename"] = path.name
+            logger.info(f"Loading Document {Path(file_path).name}")
+            documents = list(self.lazy_load_document(file_path))
             logger.info(f"Loaded {len(documents)} pages/sections")
             return documents
         except Exception as e:
             logger.error(f"Error Loading Document {file_path}: {e}")
             raise
+
+    def iter_chunk_batches(self,file_path:str,batch_size:int)->Iterator[Tuple[int,List[Document]]]:
+        """Stream (pages parsed so far, chunk batch) so memory is bounded by the batch size, not the file size"""
+        logger.info(f"Streaming Document {Path(file_path).name}")
+        pages = 0
+        page_batch: List[Document] = []
+        pending: List[Document] = []
+        for page in self.lazy_load_document(file_path):
+            pages += 1
+            page_batch.append(page)
+            if len(page_batch) >= settings.DOCUMENT_PAGE_BATCH:
+                pending.extend(self.text_splitter.split_documents(page_batch))
+                page_batch = []
+                while len(pending) >= batch_size:
+                    yield pages, pending[:batch_size]
+                    pending = pending[batch_size:]
+        if page_batch:
+            pending.extend(self.text_splitter.split_documents(page_batch))
+        while pending:
+            yield pages, pending[:batch_size]
+            pending = pending[batch_size:]
+        logger.info(f"Streamed {pages} pages/sections")
     
     def load_all_documents(self)->List[Document]:
         """Load all documents from documents directory"""
@@ -0,0 +1,74 @@
+import os
+import threading
+import dspy
+from config import settings
+from utils.logger import logger
+
+
+class DSPyPrograms:
+    """Process-wide DSPy setup: one LM per model, bounded response cache, modules built once"""
+    def __init__(self) -> None:
+        self.lms: dict = {}
+        self.programs: dict = {}
+        self.configured = False
+        self._lock = threading.Lock()
+
+    def configure(self):
+        """Configure the LM cache and the default LM once; later calls are no-ops"""
+        with self._lock:
+            if self.configured:
+                return
+            dspy.configure_cache(
+                enable_disk_cache=True,
+                enable_memory_cache=True,
+                disk_cache_dir=settings.DSPY_CACHE_DIR,
+                disk_size_limit_bytes=settings.DSPY_CACHE_MAX_BYTES,
+                memory_max_entries=settings.DSPY_CACHE_MEMORY_ENTRIES
+            )
+            dspy.configure(lm=self._build_lm(settings.LLM_MODEL))
+            self.configured = True
+            logger.info("DSPy configured successfully")
+
+    def _build_lm(self, model: str) -> dspy.LM:
+        lm = self.lms.get(model)
+        if lm is None:
+            lm = dspy.LM(
+                model=f"ollama/{model}",
+                api_base=settings.OLLAMA_BASE_URL,
+                max_tokens=512
+            )
+            self.lms[model] = lm
+        return lm
+
+    def get_lm(self, model: str = None) -> dspy.LM:
+        with self._lock:
+            return self._build_lm(model or settings.LLM_MODEL)
+
+    def context(self, model: str = None):
+        """Use the request's model for DSPy calls inside the block (thread and task safe)"""
+        return dspy.context(lm=self.get_lm(model))
+
+    def get(self, name: str, factory) -> dspy.Module:
+        """The program registered under name, built once and loaded from its compiled state if saved"""
+        with self._lock:
+            program = self.programs.get(name)
+            if program is None:
+                program = factory()
+                path = os.path.join(settings.DSPY_PROGRAMS_DIR, f"{name}.json")
+                if os.path.exists(path):
+                    try:
+                        program.load(path)
+                        logger.info(f"Loaded compiled DSPy program {name} from {path}")
+                    except Exception as e:
+                        logger.warning(f"Could not load compiled program {path}, using the default prompts: {e}")
+                self.programs[name] = program
+            return program
+
+    def save(self, name: str):
+        """Persist a program's (optimized) state so later runs load it instead of the default prompts"""
+        path = os.path.join(settings.DSPY_PROGRAMS_DIR, f"{name}.json")
+        self.programs[name].save(path)
+        logger.info(f"Saved DSPy program {name} to {path}")
+
+
+programs = DSPyPrograms()
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from services.sql_cache import LRUCache
+from utils.logger import logger
+from utils.metrics import timed
+
+DIGEST_SIZE = 32
+
+
+class EmbeddingStore:
+    """Append-only on-disk map of sha256(model, text) -> float32 vector, read through a memory map"""
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.keys_path = os.path.join(directory, "keys.bin")
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.dim = None
+        self.rows: dict = {}
+        self._mmap = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            self.dim = json.load(f)["dim"]
+        keys = open(self.keys_path, "rb").read() if os.path.exists(self.keys_path) else b""
+        vector_rows = os.path.getsize(self.vectors_path) // (4 * self.dim) if os.path.exists(self.vectors_path) else 0
+        # Vectors are written before their key, so a torn write leaves at most an unreferenced vector
+        count = min(len(keys) // DIGEST_SIZE, vector_rows)
+        self.rows = {keys[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE]: i for i in range(count)}
+        if count < vector_rows or count * DIGEST_SIZE < len(keys):
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(count * 4 * self.dim)
+            with open(self.keys_path, "r+b") as f:
+                f.truncate(count * DIGEST_SIZE)
+        logger.info(f"Loaded embedding cache with {count} vectors from {self.directory}")
+
+    def _vectors(self) -> np.ndarray:
+        """Memory map covering every stored row, re-mapped when the file has grown"""
+        if self._mmap is None or len(self._mmap) < len(self.rows):
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self.rows), self.dim))
+        return self._mmap
+
+    def get_many(self, keys: List[bytes]) -> List:
+        with self._lock:
+            if not self.rows:
+                return [None] * len(keys)
+            vectors = self._vectors()
+            return [vectors[self.rows[key]].tolist() if key in self.rows else None for key in keys]
+
+    def put_many(self, keys: List[bytes], vectors: List[List[float]]):
+        with self._lock:
+            new = [(key, vector) for key, vector in zip(keys, vectors) if key not in self.rows]
+            if not new:
+                return
+            if self.dim is None:
+                self.dim = len(new[0][1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+            block = np.asarray([vector for _, vector in new], dtype=np.float32)
+            with open(self.vectors_path, "ab") as f:
+                f.write(block.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(key for key, _ in new))
+            for key, _ in new:
+                self.rows[key] = len(self.rows)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that never recomputes a document vector it has seen and embeds misses in bounded, concurrent batches
+
+    Questions are one-off, so their vectors live in a bounded in-memory LRU instead of growing the append-only store.
+    """
+    def __init__(self, embeddings: Embeddings, model: str, cache_dir: str, batch_size: int, concurrency: int,
+                 query_cache_size: int = 2048) -> None:
+        self.embeddings = embeddings
+        self.model = model
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.store = EmbeddingStore(os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", model)))
+        self.query_cache = LRUCache(query_cache_size)
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed")
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).digest()
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.embeddings.embed_documents(texts)
+        self.batches += 1
+        return vectors
+
+    @timed("embedding.embed_documents")
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Serve cached vectors and embed the rest through the concurrency-limited pool"""
+        keys = [self._key(text) for text in texts]
+        vectors = self.store.get_many(keys)
+        missing = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+        self.hits += len(texts) - sum(1 for v in vectors if v is None)
+        self.misses += len(missing)
+        if missing:
+            missing_keys = list(missing)
+            missing_texts = [missing[key] for key in missing_keys]
+            batches = [missing_texts[i:i + self.batch_size] for i in range(0, len(missing_texts), self.batch_size)]
+            logger.info(f"Embedding {len(missing_texts)} new chunks in {len(batches)} batches "
+                        f"({len(texts) - len(missing_texts)} served from cache)")
+            computed = [vector for batch in self._pool.map(self._embed_batch, batches) for vector in batch]
+            self.store.put_many(missing_keys, computed)
+            by_key = dict(zip(missing_keys, computed))
+            vectors = [vector if vector is not None else by_key[key] for key, vector in zip(keys, vectors)]
+        return vectors
+
+    def _cached_query(self, key: bytes):
+        """Query vector from the in-memory LRU, or read-only from the store when the text was also embedded as a chunk"""
+        vector = self.query_cache.get(key)
+        if vector is None:
+            vector = self.store.get_many([key])[0]
+        if vector is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return vector
+
+    @timed("embedding.embed_query")
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self._cached_query(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+        self.query_cache.put(key, vector)
+        return vector
+
+    @timed("embedding.embed_queries")
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many questions with one call for the misses, cached like embed_query and never persisted"""
+        keys = [self._key(text) for text in texts]
+        vectors = [self._cached_query(key) for key in keys]
+        missing = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+        if missing:
+            computed = self._embed_batch(list(missing.values()))
+            by_key = dict(zip(missing, computed))
+            vectors = [vector if vector is not None else by_key[key] for key, vector in zip(keys, vectors)]
+        for key, vector in zip(keys, vectors):
+            self.query_cache.put(key, vector)
+        return vectors
+
+    @timed("embedding.embed_query")
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self._cached_query(key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+        self.query_cache.put(key, vector)
+        return vector
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model,
+            "vectors": len(self.store.rows),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "query_cache": self.query_cache.stats(),
+            "batches": self.batches,
+            "batch_size": self.batch_size,
+            "concurrency": self.concurrency,
+        }
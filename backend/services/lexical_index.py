@@ -0,0 +1,143 @@
+import heapq
+import math
+import os
+import pickle
+import re
+import threading
+from collections import Counter, defaultdict
+from utils.logger import logger
+
+# Keeps codes like "AB-1234", "v2.1" or "part_no" together as one term
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./]\w+)*")
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """In-process BM25 inverted index over the same chunks (and ids) as the vector store"""
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75) -> None:
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        # Forward index is what gets persisted; postings are derived from it on load
+        self.chunks: dict = {}  # chunk id -> (filename, {term: tf}, length)
+        self.postings: dict = defaultdict(dict)  # term -> {chunk id: tf}
+        self.total_length = 0
+        self.dirty = False
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                chunks = pickle.load(f)
+            with self._lock:
+                self.chunks = {}
+                self.postings = defaultdict(dict)
+                self.total_length = 0
+                for chunk_id, (filename, terms, length) in chunks.items():
+                    self._index(chunk_id, filename, terms, length)
+            logger.info(f"Loaded lexical index with {len(self.chunks)} chunks")
+        except Exception as e:
+            logger.warning(f"Could not load lexical index, it will be rebuilt: {e}")
+            self.chunks = {}
+
+    def save(self):
+        """Atomically write the index to disk if it changed"""
+        with self._lock:
+            if not self.dirty:
+                return
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(self.chunks, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
+    def _index(self, chunk_id: str, filename: str, terms: dict, length: int):
+        self.chunks[chunk_id] = (filename, terms, length)
+        self.total_length += length
+        for term, tf in terms.items():
+            self.postings[term][chunk_id] = tf
+
+    def _unindex(self, chunk_id: str):
+        _, terms, length = self.chunks.pop(chunk_id)
+        self.total_length -= length
+        for term in terms:
+            posting = self.postings[term]
+            posting.pop(chunk_id, None)
+            if not posting:
+                del self.postings[term]
+
+    def add(self, ids: list, texts: list, filenames: list):
+        """Index (or re-index) chunks under their vector store ids"""
+        with self._lock:
+            for chunk_id, text, filename in zip(ids, texts, filenames):
+                if chunk_id in self.chunks:
+                    self._unindex(chunk_id)
+                tokens = tokenize(text)
+                self._index(chunk_id, filename, dict(Counter(tokens)), len(tokens))
+            self.dirty = True
+
+    def remove_where(self, predicate) -> int:
+        """Drop every chunk whose filename matches predicate"""
+        with self._lock:
+            doomed = [chunk_id for chunk_id, (filename, _, _) in self.chunks.items() if predicate(filename)]
+            for chunk_id in doomed:
+                self._unindex(chunk_id)
+            if doomed:
+                self.dirty = True
+            return len(doomed)
+
+    def remove_ids(self, ids) -> int:
+        """Drop the given chunks, ignoring ids that aren't indexed"""
+        with self._lock:
+            doomed = [chunk_id for chunk_id in ids if chunk_id in self.chunks]
+            for chunk_id in doomed:
+                self._unindex(chunk_id)
+            if doomed:
+                self.dirty = True
+            return len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self.chunks = {}
+            self.postings = defaultdict(dict)
+            self.total_length = 0
+            self.dirty = True
+
+    def search(self, query: str, k: int, filter_files: list = None) -> list:
+        """Top-k (chunk id, score) pairs by BM25, optionally restricted to some files"""
+        allowed = set(filter_files) if filter_files else None
+        with self._lock:
+            n = len(self.chunks)
+            if not n:
+                return []
+            avg_length = self.total_length / n or 1
+            scores: dict = defaultdict(float)
+            for term in set(tokenize(query)):
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for chunk_id, tf in posting.items():
+                    filename, _, length = self.chunks[chunk_id]
+                    if allowed is not None and filename not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = 60) -> list:
+    """Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank)"""
+    scores: dict = defaultdict(float)
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] += 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
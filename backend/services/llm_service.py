@@ -1,73 +1,159 @@
+import threading
+import time
+from collections import OrderedDict
+import httpx
 from langchain_ollama import OllamaLLM
+from ollama import AsyncClient, Client
 from utils.logger import logger
+from utils.metrics import timed, token_usage_callback
 from langchain_core.prompts import PromptTemplate
 from config import settings
-import dspy
+from services.token_counter import context_window
+from services.dspy_programs import programs
 
 class LLMServices:
     """Services for llm operations"""
     def __init__(self) -> None:
-        self.llm = None
+        # One client per (model, temperature), so concurrent requests never swap each other's model
+        self.clients: OrderedDict = OrderedDict()
+        self.warm_models: set = set()
+        self._lock = threading.Lock()
+        self._http_client = None
+        self._transport = None
+        self._async_transport = None
 
     def intialize(self):
         """Initialize default Local LLM"""
-        self._set_llm(settings.LLM_MODEL)
+        limits = httpx.Limits(
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_HTTP_MAX_CONNECTIONS
+        )
+        # Every pooled LLM's clients are built on these transports, so requests reuse kept-alive connections to Ollama
+        self._transport = httpx.HTTPTransport(limits=limits)
+        self._async_transport = httpx.AsyncHTTPTransport(limits=limits)
+        self._http_client = Client(host=settings.OLLAMA_BASE_URL, transport=self._transport)
+        self.get_client(settings.LLM_MODEL)
         try:
-            dspy_lm = dspy.LM(
-                model=f"ollama/{settings.LLM_MODEL}",
-                api_base=settings.OLLAMA_BASE_URL,
-                max_tokens=512
-            )
-            dspy.configure(lm=dspy_lm)
-            logger.info("DSPy configured successfully")
+            programs.configure()
         except Exception as e:
             logger.error(f"Failed to configure DSPy: {e}")
 
-
-    def _set_llm(self, model_name: str):
-        """Helper to initialize/update LLM instance"""
-        try:
-            logger.info(f"Initializing Local LLM: {model_name}")
-            self.llm = OllamaLLM(
+    def get_client(self, model_name: str = None, temperature: float = None) -> OllamaLLM:
+        """Pooled LLM client for a model and temperature, created on first use (LRU evicted)"""
+        model_name = model_name or settings.LLM_MODEL
+        temperature = settings.LLM_TEMPERATURE if temperature is None else temperature
+        key = (model_name, temperature)
+        with self._lock:
+            llm = self.clients.get(key)
+            if llm is not None:
+                self.clients.move_to_end(key)
+                return llm
+            logger.info(f"Initializing Local LLM: {model_name} (temperature {temperature})")
+            llm = OllamaLLM(
                 model=model_name, 
-                temperature=settings.LLM_TEMPERATURE,
-                base_url=settings.OLLAMA_BASE_URL
+                temperature=temperature,
+                base_url=settings.OLLAMA_BASE_URL,
+                num_ctx=context_window(model_name),
+                keep_alive=settings.LLM_KEEP_ALIVE,
+                callbacks=[token_usage_callback],
+                sync_client_kwargs={"transport": self._transport} if self._transport else None,
+                async_client_kwargs={"transport": self._async_transport} if self._async_transport else None
             )
-            self.current_model = model_name
-            logger.info("Local LLM Initialized Successfully.")
-        except Exception as e:
-            logger.error(f"Failed To Initialize LLM {e}")
+            self.clients[key] = llm
+            # The default client is pinned, so get_llm always finds it, and the one just created is kept
+            # so it can be reused; the pool therefore always has room for both
+            default_key = (settings.LLM_MODEL, settings.LLM_TEMPERATURE)
+            while len(self.clients) > max(settings.LLM_POOL_SIZE, 2):
+                evicted = next(k for k in self.clients if k not in (default_key, key))
+                del self.clients[evicted]
+                logger.info(f"Evicted LLM client {evicted} from pool")
+        if settings.LLM_WARMUP:
+            self.warm_up(model_name)
+        return llm
+
+    def _client_for(self, config: dict) -> OllamaLLM:
+        return self.get_client(config.get("model"), config.get("temperature"))
+
+    def warm_up(self, model_name: str):
+        """Ask Ollama to load the model in the background so the first real query skips the load"""
+        with self._lock:
+            if model_name in self.warm_models or not self._http_client:
+                return
+            self.warm_models.add(model_name)
+
+        def ping():
+            try:
+                start = time.perf_counter()
+                # An empty prompt only loads the model and resets its keep_alive timer
+                self._http_client.generate(model=model_name, prompt="", keep_alive=settings.LLM_KEEP_ALIVE)
+                logger.info(f"Warmed up {model_name} in {time.perf_counter() - start:.2f}s")
+            except Exception as e:
+                self.warm_models.discard(model_name)
+                logger.warning(f"Warm-up of {model_name} failed: {e}")
+
+        threading.Thread(target=ping, name=f"warmup-{model_name}", daemon=True).start()
+
+    def _format_prompt(self,prompt:str,context:str)->str:
+        """Build the final answer prompt"""
+        template = PromptTemplate.from_template(
+            """
+            # System
+            Answer the user query from the context below with out adding any explaination, make it a direct answer.
+            If you can't answer from the context, Answer the question by your knowledge.
+
+            ## Context:
+            {context}
+            ## Question:
+            {question}
+            ## Answer:
+            ...
+            """
+        )
+        return template.format(
+            context = context if context else "There is no available context",
+            question=prompt
+        )
+
+    @timed("llm.generate_response")
     def generate_response(self,prompt:str,context:str="",config: dict = {"model":"llama3.1:8b"})->str:
         """Generate a response from the LLM"""
         try:
-            requested_model = config.get('model', settings.LLM_MODEL)
-            if requested_model != self.current_model:
-                self._set_llm(requested_model)
-            template = PromptTemplate.from_template(
-                """
-                # System
-                Answer the user query from the context below with out adding any explaination, make it a direct answer.
-                If you can't answer from the context, Answer the question by your knowledge.
+            llm = self._client_for(config)
+            formatted_prompt = self._format_prompt(prompt, context)
+            response = llm.invoke(formatted_prompt)
+            return response
+        except Exception as e:
+            logger.error(f"Error Generating Response {e}")
+            return f"Error generate reponse: {str(e)}"
 
-                ## Context:
-                {context}
-                ## Question:
-                {question}
-                ## Answer:
-                ...
-                """
-            )
-            formatted_prompt = template.format(
-                context = context if context else "There is no available context",
-                question=prompt
-            )
-            response = self.llm.invoke(formatted_prompt) if self.llm else ""
+    @timed("llm.generate_response")
+    async def agenerate_response(self,prompt:str,context:str="",config: dict = {"model":"llama3.1:8b"})->str:
+        """Generate a response from the LLM without blocking the event loop"""
+        try:
+            llm = self._client_for(config)
+            formatted_prompt = self._format_prompt(prompt, context)
+            response = await llm.ainvoke(formatted_prompt)
             return response
         except Exception as e:
             logger.error(f"Error Generating Response {e}")
             return f"Error generate reponse: {str(e)}"
+
+    @timed("llm.generate_response")
+    async def astream_response(self,prompt:str,context:str="",config: dict = {"model":"llama3.1:8b"}):
+        """Yield the response token by token as Ollama produces it"""
+        llm = self._client_for(config)
+        formatted_prompt = self._format_prompt(prompt, context)
+        async for chunk in llm.astream(formatted_prompt):
+            yield chunk
         
     def get_llm(self):
-        """Get the LLM instance"""
-        return self.llm
+        """Get the default LLM instance"""
+        return self.get_client()
+
+    def stats(self) -> dict:
+        return {
+            "clients": [{"model": model, "temperature": temperature} for model, temperature in self.clients],
+            "max_clients": settings.LLM_POOL_SIZE,
+            "warm_models": sorted(self.warm_models),
+        }
             
\ No newline at end of file
@@ -0,0 +1,94 @@
+import hashlib
+import threading
+import numpy as np
+from utils.logger import logger
+
+
+def content_hash(text: str) -> str:
+    """Hash of whitespace- and case-normalized chunk text, so overlap copies compare equal"""
+    return hashlib.sha1(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+
+def dedupe(docs: list, vectors=None, threshold: float = None):
+    """Drop later chunks that repeat an earlier (better ranked) one
+
+    Exact copies are caught by normalized content hash; with vectors and a threshold,
+    chunks whose cosine similarity to a kept chunk reaches it count as near-duplicates.
+    """
+    seen = set()
+    keep = []
+    unit = normalize_rows(np.asarray(vectors, dtype=np.float32)) if vectors is not None and threshold else None
+    for index, doc in enumerate(docs):
+        digest = content_hash(doc.page_content)
+        if digest in seen:
+            continue
+        if unit is not None and keep and float(np.max(unit[keep] @ unit[index])) >= threshold:
+            continue
+        seen.add(digest)
+        keep.append(index)
+    kept_vectors = vectors[keep] if vectors is not None else None
+    return [docs[i] for i in keep], kept_vectors
+
+
+def rank_relevance(n: int, k: int = 60) -> np.ndarray:
+    """Reciprocal-rank scores of an already fused ranking, scaled to [0, 1] (best first)"""
+    scores = 1.0 / (k + np.arange(1, n + 1, dtype=np.float32))
+    spread = scores[0] - scores[-1] if n else 0
+    return (scores - scores[-1]) / spread if spread else np.ones(n, dtype=np.float32)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def mmr(relevance: np.ndarray, vectors: np.ndarray, k: int, lambda_mult: float) -> list:
+    """Maximal marginal relevance over precomputed candidate vectors; returns picked indices"""
+    n = len(relevance)
+    if n <= 1 or k <= 0:
+        return list(range(min(n, k)))
+    unit = normalize_rows(vectors)
+    similarity = unit @ unit.T
+    selected = [int(np.argmax(relevance))]
+    max_similarity = similarity[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < min(k, n):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        np.maximum(max_similarity, similarity[pick], out=max_similarity)
+    return selected
+
+
+class CrossEncoderReranker:
+    """Local cross-encoder (sentence-transformers) scoring (question, chunk) pairs"""
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+        self.model = None
+        self.available = bool(model_name)
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            from sentence_transformers import CrossEncoder
+            self.model = CrossEncoder(self.model_name)
+            logger.info(f"Loaded reranker {self.model_name}")
+        except Exception as e:
+            logger.warning(f"Reranker {self.model_name} unavailable, continuing without it: {e}")
+            self.available = False
+
+    def score(self, question: str, docs: list):
+        """Relevance scores scaled to [0, 1], or None when no reranker is configured"""
+        if not self.available or not docs:
+            return None
+        with self._lock:
+            if self.model is None and self.available:
+                self._load()
+        if not self.available:
+            return None
+        scores = np.asarray(self.model.predict([(question, doc.page_content) for doc in docs]), dtype=np.float32)
+        spread = scores.max() - scores.min()
+        return (scores - scores.min()) / spread if spread else np.ones_like(scores)
@@ -0,0 +1,190 @@
+import threading
+import numpy as np
+from sqlalchemy import inspect, text
+from services.sql_pool import db_file_mtime
+from services.token_counter import get_token_counter
+from utils.logger import logger
+
+
+def estimate_tokens(text_value: str) -> int:
+    """Token count of schema text for the default model"""
+    return get_token_counter().count(text_value)
+
+
+class SchemaCache:
+    """Database schema reflected once and re-reflected only when PRAGMA schema_version changes"""
+    def __init__(self, engine, db_path: str, sample_rows: int) -> None:
+        self.engine = engine
+        self.db_path = db_path
+        self.sample_rows = sample_rows
+        self.tables: dict = {}
+        self._mtime = None
+        self.schema_version = None
+        self._lock = threading.Lock()
+
+    def _read_schema_version(self):
+        with self.engine.connect() as conn:
+            return conn.exec_driver_sql("PRAGMA schema_version").scalar()
+
+    def refresh(self):
+        """Reflect every table: columns, types, primary/foreign keys and a few sample values"""
+        inspector = inspect(self.engine)
+        tables = {}
+        for table in inspector.get_table_names():
+            try:
+                columns = inspector.get_columns(table)
+                primary_keys = set(inspector.get_pk_constraint(table).get("constrained_columns") or [])
+                foreign_keys = {}
+                for fk in inspector.get_foreign_keys(table):
+                    for column, ref_column in zip(fk["constrained_columns"], fk["referred_columns"]):
+                        foreign_keys[column] = f"{fk['referred_table']}.{ref_column}"
+                tables[table] = {
+                    "columns": [
+                        {
+                            "name": col["name"],
+                            "type": str(col["type"]),
+                            "primary_key": col["name"] in primary_keys,
+                            "foreign_key": foreign_keys.get(col["name"]),
+                        }
+                        for col in columns
+                    ],
+                    "samples": self._sample_values(table) if self.sample_rows else {},
+                }
+            except Exception as e:
+                logger.warning(f"Could not reflect table {table}: {e}")
+        self.tables = tables
+        self.schema_version = self._read_schema_version()
+        self._mtime = db_file_mtime(self.db_path)
+        logger.info(f"Schema cache built for {len(tables)} tables (schema_version {self.schema_version})")
+
+    def _sample_values(self, table: str) -> dict:
+        """Distinct non-null values per column from the first few rows"""
+        with self.engine.connect() as conn:
+            result = conn.execute(text(f'SELECT * FROM "{table}" LIMIT :limit'), {"limit": self.sample_rows})
+            columns = list(result.keys())
+            rows = result.fetchall()
+        samples = {}
+        for index, column in enumerate(columns):
+            values = []
+            for row in rows:
+                value = row[index]
+                if value is not None and value not in values and len(str(value)) <= 40:
+                    values.append(value)
+            if values:
+                samples[column] = values
+        return samples
+
+    def ensure_fresh(self):
+        """Cheap staleness check: stat the file, and only on an mtime change compare schema_version"""
+        try:
+            mtime = db_file_mtime(self.db_path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            if self._read_schema_version() != self.schema_version:
+                logger.info("Database schema changed, rebuilding schema cache")
+                self.refresh()
+            else:
+                self._mtime = mtime
+
+    def get_table_names(self) -> list:
+        self.ensure_fresh()
+        return list(self.tables)
+
+    def get_table(self, table: str) -> dict:
+        self.ensure_fresh()
+        return self.tables.get(table, {})
+
+    def _render_table(self, table: str, with_samples: bool) -> str:
+        info = self.tables[table]
+        columns = []
+        for col in info["columns"]:
+            column = f"{col['name']} {col['type']}"
+            if col["primary_key"]:
+                column += " PK"
+            if col["foreign_key"]:
+                column += f" FK->{col['foreign_key']}"
+            columns.append(column)
+        line = f"{table}({', '.join(columns)})"
+        if with_samples and info["samples"]:
+            examples = "; ".join(
+                f"{name}: {', '.join(repr(v) for v in values)}" for name, values in info["samples"].items()
+            )
+            line += f"\n  -- examples {examples}"
+        return line
+
+    def render(self, tables: list = None, token_budget: int = 2000) -> str:
+        """Compact schema text for the given tables that fits in token_budget"""
+        self.ensure_fresh()
+        names = [t for t in (tables or list(self.tables)) if t in self.tables]
+        for with_samples in (True, False):
+            lines = [self._render_table(t, with_samples) for t in names]
+            schema = "\n".join(lines)
+            if estimate_tokens(schema) <= token_budget:
+                return schema
+        # Still too big without samples: keep whole tables until the budget runs out
+        kept, used = [], 0
+        for line in lines:
+            cost = estimate_tokens(line)
+            if used + cost > token_budget:
+                break
+            kept.append(line)
+            used += cost
+        omitted = names[len(kept):]
+        kept.append(f"-- {len(omitted)} more tables omitted: {', '.join(omitted)}")
+        return "\n".join(kept)
+
+
+class SchemaIndex:
+    """Embeddings of table descriptions used to pick the tables relevant to a question"""
+    def __init__(self, schema_cache: SchemaCache, embedding) -> None:
+        self.schema_cache = schema_cache
+        self.embedding = embedding
+        self.names: list = []
+        self.matrix = None
+        self._schema_version = None
+        self._lock = threading.Lock()
+
+    def _describe(self, table: str) -> str:
+        columns = self.schema_cache.tables[table]["columns"]
+        return f"{table}: " + ", ".join(f"{col['name']} {col['type']}" for col in columns)
+
+    def _ensure_built(self):
+        self.schema_cache.ensure_fresh()
+        if self.matrix is not None and self._schema_version == self.schema_cache.schema_version:
+            return
+        with self._lock:
+            if self.matrix is not None and self._schema_version == self.schema_cache.schema_version:
+                return
+            names = list(self.schema_cache.tables)
+            vectors = np.asarray(self.embedding.embed_documents([self._describe(t) for t in names]), dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            self.matrix = vectors / np.where(norms == 0, 1, norms)
+            self.names = names
+            self._schema_version = self.schema_cache.schema_version
+            logger.info(f"Schema index built for {len(names)} tables")
+
+    def _neighbours(self, tables: list) -> list:
+        """Tables linked to the given ones by a foreign key in either direction"""
+        selected = set(tables)
+        linked = []
+        for table, info in self.schema_cache.tables.items():
+            refs = {col["foreign_key"].split(".")[0] for col in info["columns"] if col["foreign_key"]}
+            if table in selected:
+                linked.extend(refs)
+            elif refs & selected:
+                linked.append(table)
+        return [t for t in dict.fromkeys(linked) if t not in selected and t in self.schema_cache.tables]
+
+    def select(self, question_vector, top_n: int) -> list:
+        """Top-N tables by cosine similarity to the question, plus their FK neighbours"""
+        self._ensure_built()
+        query = np.asarray(question_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+        scores = self.matrix @ query
+        top = [self.names[i] for i in np.argsort(-scores)[:top_n]]
+        return top + self._neighbours(top)
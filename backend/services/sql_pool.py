@@ -0,0 +1,90 @@
+import os
+import sqlite3
+import time
+from urllib.parse import quote
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+from config import settings
+from utils.logger import logger
+
+
+def db_file_mtime(db_path: str) -> float:
+    """Latest mtime of the database and its WAL file (WAL writes don't touch the main file until checkpoint)"""
+    mtimes = [os.path.getmtime(path) for path in (db_path, f"{db_path}-wal") if os.path.exists(path)]
+    if not mtimes:
+        raise FileNotFoundError(db_path)
+    return max(mtimes)
+
+
+class ReadOnlyPool:
+    """Sized pool of read-only (mode=ro, query_only) SQLite connections tuned for concurrent readers"""
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        if settings.SQL_ENABLE_WAL:
+            self._enable_wal()
+        self.engine = create_engine(
+            f"sqlite:///file:{quote(os.path.abspath(db_path))}?mode=ro&uri=true",
+            poolclass=QueuePool,
+            pool_size=settings.SQL_POOL_SIZE,
+            max_overflow=settings.SQL_POOL_OVERFLOW,
+            pool_timeout=settings.SQL_TIMEOUT,
+            # LIFO keeps a small set of hot connections (and their page cache / statement cache) in use
+            pool_use_lifo=True,
+            connect_args={
+                "check_same_thread": False,
+                "cached_statements": settings.SQL_STATEMENT_CACHE,
+            },
+        )
+        self.connections_opened = 0
+        self.checkouts = 0
+        self.total_checkout_wait = 0.0
+        event.listen(self.engine, "connect", self._on_connect)
+        self.journal_mode = self._read_journal_mode()
+        logger.info(f"Read-only SQLite pool ready (journal_mode={self.journal_mode}, size={settings.SQL_POOL_SIZE})")
+
+    def _enable_wal(self):
+        """Switch the file to WAL once so readers never block (or get blocked by) a writer"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            logger.info(f"Database journal mode: {mode}")
+        finally:
+            conn.close()
+
+    def _on_connect(self, dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA query_only=ON")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQL_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.SQL_CACHE_SIZE_KB)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+        self.connections_opened += 1
+
+    def _read_journal_mode(self) -> str:
+        with self.engine.connect() as conn:
+            return conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+
+    def connect(self):
+        """Check out a connection, timing how long the caller waited for it"""
+        start = time.perf_counter()
+        conn = self.engine.connect()
+        self.checkouts += 1
+        self.total_checkout_wait += time.perf_counter() - start
+        return conn
+
+    def stats(self) -> dict:
+        pool = self.engine.pool
+        return {
+            "journal_mode": self.journal_mode,
+            "size": pool.size(),
+            "max_overflow": settings.SQL_POOL_OVERFLOW,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "connections_opened": self.connections_opened,
+            "checkouts": self.checkouts,
+            "avg_checkout_wait_ms": round(self.total_checkout_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+        }
+
+    def dispose(self):
+        self.engine.dispose()
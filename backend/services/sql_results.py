@@ -0,0 +1,51 @@
+import threading
+import uuid
+from collections import OrderedDict
+
+
+class SQLResultStore:
+    """Remembers the SQL behind recent results so their full rows can be paged later"""
+    def __init__(self, max_results: int) -> None:
+        self.max_results = max_results
+        self._queries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, sql_query: str) -> str:
+        result_id = uuid.uuid4().hex
+        with self._lock:
+            self._queries[result_id] = sql_query
+            while len(self._queries) > self.max_results:
+                self._queries.popitem(last=False)
+        return result_id
+
+    def get(self, result_id: str):
+        with self._lock:
+            return self._queries.get(result_id)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def summarize_result(result: dict, max_rows: int, sample_rows: int) -> str:
+    """Render a result for the LLM: every row when small, else aggregates plus a head/tail sample"""
+    rows = result["rows"]
+    columns = result["columns"]
+    total = result["total_count"]
+    total_text = f"{total}" if total is not None else f"more than {len(rows)}"
+    if len(rows) <= max_rows and not result["truncated"]:
+        return f"{len(rows)} rows: {rows}"
+
+    lines = [f"Columns: {', '.join(columns)}",
+             f"Rows: {total_text} in total, {len(rows)} fetched (showing a sample)"]
+    for column in columns:
+        values = [row[column] for row in rows if _is_number(row[column])]
+        if values:
+            lines.append(
+                f"{column}: min={min(values)}, max={max(values)}, "
+                f"avg={round(sum(values) / len(values), 4)}, sum={round(sum(values), 4)} (over fetched rows)"
+            )
+    lines.append(f"First rows: {rows[:sample_rows]}")
+    if len(rows) > sample_rows:
+        lines.append(f"Last rows: {rows[-sample_rows:]}")
+    return "\n".join(lines)
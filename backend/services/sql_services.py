@@ -1,26 +1,42 @@
 import os
+import time
+import asyncio
+from contextlib import contextmanager
 import dspy
 from langchain_community.utilities import SQLDatabase
-from sqlalchemy import text, inspect
+from sqlalchemy import text
 from utils.logger import logger
+from utils.metrics import timed
 from config import settings
+from services.schema_cache import SchemaCache, SchemaIndex, estimate_tokens
+from services.sql_results import SQLResultStore
+from services.sql_pool import ReadOnlyPool, db_file_mtime
+from services.sql_cache import LRUCache, is_deterministic
+from utils.helpers import normalize_question
+from services.dspy_programs import programs
 
 class SQLService:
     def __init__(self) -> None:
         self.db = None
-        self.lm = None
         self.avaliable_tables = []
+        self.db_path = None
+        self.schema_cache = None
+        self.pool = None
+        self.schema_index = None
+        self.embedding = None
+        self.result_store = SQLResultStore(settings.SQL_RESULT_HISTORY)
+        self.sql_generator = None
+        self.sql_cache = LRUCache(settings.SQL_CACHE_SIZE)
+        self.result_cache = LRUCache(settings.SQL_RESULT_CACHE_SIZE)
 
-    def initialize(self):
+    def initialize(self, embedding=None):
         """Initialize Database"""
+        if embedding:
+            self.embedding = embedding
         try:
-            # Initialize DSPy LM
-            self.lm = dspy.LM(
-                model=f"ollama/{settings.LLM_MODEL}",
-                api_base=settings.OLLAMA_BASE_URL,
-                max_tokens=512
-            )
-            dspy.configure(lm=self.lm)
+            # Shared DSPy setup; the generator module is built once for the whole process
+            programs.configure()
+            self.sql_generator = programs.get("text2sql", self.SQLGenerator)
             
             # Dynamic Database Detection
             db_dir = os.path.dirname(settings.DATABASE_PATH)
@@ -44,8 +60,18 @@ class SQLService:
             
             if real_db_path and os.path.exists(real_db_path):
                 logger.info(f"Connecting to database: {real_db_path}")
-                self.db = SQLDatabase.from_uri(f"sqlite:///{real_db_path}")
-                self.avaliable_tables = self.db.get_usable_table_names()
+                if self.pool:
+                    self.pool.dispose()
+                self.pool = ReadOnlyPool(real_db_path)
+                self.db = SQLDatabase(self.pool.engine)
+                self.db_path = real_db_path
+                self.sql_cache.clear()
+                self.result_cache.clear()
+                self.schema_cache = SchemaCache(self.db._engine, real_db_path, settings.SCHEMA_SAMPLE_ROWS)
+                self.schema_cache.refresh()
+                if self.embedding:
+                    self.schema_index = SchemaIndex(self.schema_cache, self.embedding)
+                self.avaliable_tables = self.schema_cache.get_table_names()
                 logger.info("Database connected successfully")
                 logger.info(f"Available tables: {self.avaliable_tables}")
             else:
@@ -55,24 +81,27 @@ class SQLService:
             logger.error(f"Failed to initialize database {e}")
     
     def get_avaliable_tables(self):
-        return self.avaliable_tables if self.db else []
+        if not self.db:
+            return []
+        self.avaliable_tables = self.schema_cache.get_table_names()
+        return self.avaliable_tables
     
     def get_table_schema(self, table_name: str) -> dict:
-        """Get schema information for a specific table"""
+        """Get schema information for a specific table from the schema cache"""
         try:
             if not self.db:
                 return {}
             
-            inspector = inspect(self.db._engine)
-            columns = inspector.get_columns(table_name)
-            
+            table = self.schema_cache.get_table(table_name)
             return {
                 "columns": [
                     {
                         "name": col["name"],
-                        "type": str(col["type"])
+                        "type": col["type"],
+                        "primary_key": col["primary_key"],
+                        "foreign_key": col["foreign_key"]
                     }
-                    for col in columns
+                    for col in table.get("columns", [])
                 ]
             }
         except Exception as e:
@@ -86,32 +115,72 @@ class SQLService:
         sql_query = dspy.OutputField(desc="SQL Query only, no explanation")
 
     class SQLGenerator(dspy.Module):
-        def __init__(self, db, selected_tables=None):
+        def __init__(self):
             super().__init__()
-            self.db = db
-            self.selected_tables = selected_tables
             self.generate_sql = dspy.ChainOfThought(SQLService.Text2SQL)
-        
-        def forward(self, question):
+
+        def forward(self, question, schema):
             """Generate SQL from natural language question"""
-            # Get schema - filter by selected tables if specified
-            if self.selected_tables:
-                schema_parts = []
-                for table in self.selected_tables:
-                    try:
-                        table_info = self.db.get_table_info_no_throw([table])
-                        if table_info:
-                            schema_parts.append(table_info)
-                    except:
-                        pass
-                schema = "\n\n".join(schema_parts) if schema_parts else self.db.get_table_info()
-            else:
-                schema = self.db.get_table_info()
-            
             prediction = self.generate_sql(schema_db=schema, question=question)
             return prediction.sql_query
+
+        async def aforward(self, question, schema):
+            """Generate SQL without blocking the event loop"""
+            prediction = await self.generate_sql.acall(schema_db=schema, question=question)
+            return prediction.sql_query
+
+    def _build_schema(self, question: str, selected_tables: list, question_embedding=None, metadata: dict = None) -> str:
+        """Schema text for the prompt: selected tables, else the tables most relevant to the question"""
+        tables = [t for t in (selected_tables or []) if t in self.schema_cache.tables]
+        pruned = False
+        if not tables:
+            all_tables = self.schema_cache.get_table_names()
+            if self.schema_index and settings.SCHEMA_PRUNING_ENABLED and len(all_tables) > settings.SCHEMA_TOP_K_TABLES:
+                try:
+                    vector = question_embedding or self.embedding.embed_query(question)
+                    tables = self.schema_index.select(vector, settings.SCHEMA_TOP_K_TABLES)
+                    pruned = True
+                except Exception as e:
+                    logger.warning(f"Schema pruning failed, sending the full schema: {e}")
+            tables = tables or all_tables
+        schema = self.schema_cache.render(tables, settings.SCHEMA_TOKEN_BUDGET)
+        logger.info(f"Schema prompt: {len(tables)} tables, ~{estimate_tokens(schema)} tokens")
+        if metadata is not None:
+            metadata["schema_tables"] = len(tables)
+            metadata["schema_tokens"] = estimate_tokens(schema)
+            metadata["schema_pruned"] = pruned
+        return schema
     
-    def generate_sql(self, question: str, selected_tables: list = []) -> str:
+    def _sql_cache_key(self, question: str, selected_tables: list, model: str = None) -> tuple:
+        """Generated SQL depends on the question, the table selection, the schema and the model"""
+        self.schema_cache.ensure_fresh()
+        return (
+            normalize_question(question),
+            tuple(sorted(selected_tables or [])),
+            self.schema_cache.schema_version,
+            model or settings.LLM_MODEL,
+        )
+
+    def _cached_sql(self, key: tuple, metadata: dict = None):
+        sql_query = self.sql_cache.get(key)
+        if metadata is not None:
+            metadata["sql_cache"] = "hit" if sql_query else "miss"
+        if sql_query:
+            logger.info("Generated SQL cache hit, skipping generation")
+        return sql_query
+
+    def validate_sql(self, sql_query: str) -> bool:
+        """Check that SQLite can parse and plan the query without running it"""
+        try:
+            with self._timed_connection() as conn:
+                conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql_query.strip().rstrip(';')}").fetchall()
+            return True
+        except Exception as e:
+            logger.warning(f"Generated SQL failed validation, not caching it: {e}")
+            return False
+
+    @timed("sql.generate_sql")
+    def generate_sql(self, question: str, selected_tables: list = [], question_embedding=None, metadata: dict = None, model: str = None) -> str:
         """Generate SQL query from natural language question"""
         if self.db is None:
             # Try to re-initialize if not connected (lazy load attempt)
@@ -119,20 +188,139 @@ class SQLService:
             if self.db is None:
                 raise ValueError("Database not initialized. Please upload a .db file.")
         
-        sql_gen = self.SQLGenerator(self.db, selected_tables)
-        sql_query = sql_gen(question)
-        return str(sql_query)
+        key = self._sql_cache_key(question, selected_tables, model)
+        sql_query = self._cached_sql(key, metadata)
+        if sql_query:
+            return sql_query
+        schema = self._build_schema(question, selected_tables, question_embedding, metadata)
+        with programs.context(model):
+            sql_query = str(self.sql_generator(question, schema))
+        if self.validate_sql(sql_query):
+            self.sql_cache.put(key, sql_query)
+        return sql_query
+
+    @timed("sql.generate_sql")
+    async def agenerate_sql(self, question: str, selected_tables: list = [], question_embedding=None, metadata: dict = None, model: str = None) -> str:
+        """Async variant of generate_sql"""
+        if self.db is None:
+            await asyncio.to_thread(self.initialize)
+            if self.db is None:
+                raise ValueError("Database not initialized. Please upload a .db file.")
+        
+        key = await asyncio.to_thread(self._sql_cache_key, question, selected_tables, model)
+        sql_query = self._cached_sql(key, metadata)
+        if sql_query:
+            return sql_query
+        schema = await asyncio.to_thread(self._build_schema, question, selected_tables, question_embedding, metadata)
+        with programs.context(model):
+            sql_query = str(await self.sql_generator.acall(question, schema))
+        if await asyncio.to_thread(self.validate_sql, sql_query):
+            self.sql_cache.put(key, sql_query)
+        return sql_query
     
-    def execute_sql_as_dict(self, sql_query: str) -> list[dict]:
-        """Execute SQL and return results as list of dictionaries"""
+    @contextmanager
+    def _timed_connection(self):
+        """Connection whose statements are interrupted by SQLite once SQL_TIMEOUT elapses"""
+        with self.pool.connect() as conn:
+            raw = conn.connection.driver_connection
+            deadline = time.monotonic() + settings.SQL_TIMEOUT
+            raw.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, 1000)
+            try:
+                yield conn
+            finally:
+                raw.set_progress_handler(None, 0)
+
+    def _fetch_bounded(self, conn, sql_query: str, params: dict = None, max_rows: int = None):
+        """Fetch in batches, stopping at the row or byte cap; returns (columns, rows, truncated)"""
+        max_rows = max_rows or settings.SQL_MAX_ROWS
+        result = conn.execute(text(sql_query), params or {})
+        if not result.returns_rows:
+            return [], [], False
+        columns = list(result.keys())
+        rows, size = [], 0
+        while True:
+            batch = result.fetchmany(256)
+            if not batch:
+                return columns, rows, False
+            for row in batch:
+                if len(rows) >= max_rows or size >= settings.SQL_MAX_BYTES:
+                    result.close()
+                    return columns, rows, True
+                rows.append(dict(zip(columns, row)))
+                size += len(repr(row))
+
+    def _count_rows(self, conn, sql_query: str):
+        """Total row count of a query, or None if it can't be counted within the timeout"""
+        try:
+            return conn.execute(text(f"SELECT COUNT(*) FROM ({sql_query})")).scalar()
+        except Exception as e:
+            logger.warning(f"Could not count rows of truncated result: {e}")
+            return None
+
+    @timed("sql.execute_sql")
+    def execute_sql(self, sql_query: str) -> dict:
+        """Execute SQL with row/byte caps and a statement timeout"""
         if self.db is None:
              raise ValueError("Database not initialized.")
+        sql_query = sql_query.strip().rstrip(";")
+        cache_key = None
+        if settings.SQL_RESULT_CACHE_ENABLED and is_deterministic(sql_query):
+            cache_key = (sql_query, db_file_mtime(self.db_path))
+            cached = self.result_cache.get(cache_key)
+            if cached:
+                return {**cached, "result_id": self.result_store.add(sql_query), "cached": True}
         try:
-            with self.db._engine.connect() as conn:
-                result = conn.execute(text(sql_query))
-                columns = result.keys()
-                rows = result.fetchall()
-                return [dict(zip(columns, row)) for row in rows]
+            with self._timed_connection() as conn:
+                columns, rows, truncated = self._fetch_bounded(conn, sql_query)
+                total_count = self._count_rows(conn, sql_query) if truncated else len(rows)
         except Exception as e:
             logger.error(f"Failed to execute SQL: {e}")
-            raise
\ No newline at end of file
+            raise
+        if truncated:
+            logger.info(f"SQL result truncated to {len(rows)} rows (total {total_count})")
+        result = {
+            "result_id": self.result_store.add(sql_query),
+            "columns": columns,
+            "rows": rows,
+            "truncated": truncated,
+            "total_count": total_count,
+            "cached": False
+        }
+        if cache_key:
+            self.result_cache.put(cache_key, result)
+        return result
+
+    def fetch_page(self, result_id: str, page: int, page_size: int) -> dict:
+        """Re-run a stored query for one page of its full result"""
+        sql_query = self.result_store.get(result_id)
+        if sql_query is None:
+            raise KeyError(result_id)
+        with self._timed_connection() as conn:
+            columns, rows, _ = self._fetch_bounded(
+                conn,
+                f"SELECT * FROM ({sql_query}) LIMIT :limit OFFSET :offset",
+                {"limit": page_size + 1, "offset": (page - 1) * page_size},
+                max_rows=page_size + 1
+            )
+        return {
+            "result_id": result_id,
+            "columns": columns,
+            "rows": rows[:page_size],
+            "page": page,
+            "page_size": page_size,
+            "has_more": len(rows) > page_size
+        }
+
+    def execute_sql_as_dict(self, sql_query: str) -> list[dict]:
+        """Execute SQL and return results as list of dictionaries (capped at SQL_MAX_ROWS)"""
+        return self.execute_sql(sql_query)["rows"]
+
+    async def aexecute_sql(self, sql_query: str) -> dict:
+        """Execute SQL on a worker thread so the event loop stays free"""
+        return await asyncio.to_thread(self.execute_sql, sql_query)
+
+    def cache_stats(self) -> dict:
+        return {
+            "generated_sql": self.sql_cache.stats(),
+            "results": {"enabled": settings.SQL_RESULT_CACHE_ENABLED, **self.result_cache.stats()}
+        }
@@ -0,0 +1,62 @@
+import os
+import threading
+from config import settings
+from utils.logger import logger
+
+
+class TokenCounter:
+    """Counts tokens with the model's own tokenizer when its tokenizer.json is available
+
+    Ollama does not expose its tokenizer, so the Hugging Face tokenizer file of the model
+    family is looked up as TOKENIZER_DIR/<model name without tag>.json (for example
+    llama3.1.json for llama3.1:8b). Without it a conservative character estimate is used.
+    """
+    def __init__(self, model: str) -> None:
+        self.model = model
+        self.tokenizer = None
+        path = os.path.join(settings.TOKENIZER_DIR, f"{model.split(':')[0]}.json")
+        if os.path.exists(path):
+            try:
+                from tokenizers import Tokenizer
+                self.tokenizer = Tokenizer.from_file(path)
+                logger.info(f"Loaded tokenizer for {model} from {path}")
+            except Exception as e:
+                logger.warning(f"Could not load tokenizer {path}, estimating tokens instead: {e}")
+        self.exact = self.tokenizer is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.tokenizer:
+            return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+        # ~3.5 characters per token for English BPE vocabularies; rounds up to stay under budget
+        return int(len(text) / 3.5) + 1
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of text that fits in max_tokens"""
+        if max_tokens <= 0:
+            return ""
+        if self.tokenizer:
+            encoding = self.tokenizer.encode(text, add_special_tokens=False)
+            if len(encoding.ids) <= max_tokens:
+                return text
+            return text[:encoding.offsets[max_tokens - 1][1]]
+        return text[:int((max_tokens - 1) * 3.5)]
+
+
+_counters: dict = {}
+_lock = threading.Lock()
+
+
+def get_token_counter(model: str = None) -> TokenCounter:
+    model = model or settings.LLM_MODEL
+    with _lock:
+        if model not in _counters:
+            _counters[model] = TokenCounter(model)
+        return _counters[model]
+
+
+def context_window(model: str = None) -> int:
+    """Context length the model is run with (num_ctx)"""
+    model = model or settings.LLM_MODEL
+    return settings.MODEL_CONTEXT_WINDOWS.get(model, settings.LLM_NUM_CTX)
@@ -1,74 +1,310 @@
 from langchain_ollama.embeddings import OllamaEmbeddings
 from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from services.embedding_service import CachedEmbeddings
+from services.lexical_index import BM25Index, reciprocal_rank_fusion
+from services.reranking import CrossEncoderReranker, dedupe, mmr, normalize_rows, rank_relevance
 from utils.logger import logger
+from utils.metrics import timed
 from config import settings
+import asyncio
+import numpy as np
 import os
+import threading
+import time
+
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+
+
+def make_chunk_id(filename: str, content_hash: str, chunk_index: int) -> str:
+    """Deterministic chunk id so re-indexing the same file upserts instead of duplicating"""
+    return f"{filename}:{content_hash}:{chunk_index}"
 
 class VectorestoreService:
     """Service for vector store operations."""
     def __init__(self) -> None:
         self.embedding = None
         self.vectorestore = None
+        self.lexical = BM25Index(settings.LEXICAL_INDEX_PATH)
+        self.retrieval_stats = {mode: {"queries": 0, "total_ms": 0.0} for mode in RETRIEVAL_MODES}
+        self._stats_lock = threading.Lock()
+        self.reranker = CrossEncoderReranker(settings.RERANKER_MODEL)
 
     def initialize(self):
         """Initialize vectore store and embedding model"""
         try:
             logger.info(f"Initialize embedding...")
-            self.embedding = OllamaEmbeddings(model=settings.EMBEDDING_MODEL)
+            self.embedding = CachedEmbeddings(
+                OllamaEmbeddings(model=settings.EMBEDDING_MODEL, base_url=settings.OLLAMA_BASE_URL),
+                model=settings.EMBEDDING_MODEL,
+                cache_dir=settings.EMBEDDING_CACHE_DIR,
+                batch_size=settings.EMBEDDING_BATCH_SIZE,
+                concurrency=settings.EMBEDDING_CONCURRENCY,
+                query_cache_size=settings.EMBEDDING_QUERY_CACHE_SIZE
+            )
             logger.info(f"Loading vectore store...")
             self.vectorestore = Chroma(
                 persist_directory=settings.VECTORSTORE_DIR,
                 embedding_function=self.embedding
             )
+            self.lexical.load()
+            self._sync_lexical_index()
             logger.info("Vector store initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize vectore store {e}")
             raise
 
-    def add_documents(self, documents):
+    def _sync_lexical_index(self, page_size: int = 1000):
+        """Rebuild the BM25 index from the stored chunks when it is missing or out of step"""
+        count = self.vectorestore._collection.count()
+        if count == len(self.lexical):
+            return
+        logger.info(f"Rebuilding lexical index ({len(self.lexical)} indexed, {count} chunks stored)...")
+        self.lexical.clear()
+        for offset in range(0, count, page_size):
+            batch = self.vectorestore._collection.get(
+                limit=page_size, offset=offset, include=["documents", "metadatas"]
+            )
+            self.lexical.add(
+                batch["ids"],
+                batch["documents"],
+                [(metadata or {}).get("filename") for metadata in batch["metadatas"]]
+            )
+        self.lexical.save()
+        logger.info(f"Lexical index rebuilt with {len(self.lexical)} chunks")
+
+    @timed("vectorstore.add_documents")
+    def add_documents(self, documents, ids=None):
         """Add documents to the vector store"""
         try:
             if not documents:
                 logger.warning("No documents to add")
                 return
             logger.info(f"Adding {len(documents)} to vector store...")
-            self.vectorestore.add_documents(documents=documents) if self.vectorestore else None
+            if self.vectorestore:
+                ids = self.vectorestore.add_documents(documents=documents, ids=ids)
+                self.lexical.add(
+                    ids,
+                    [doc.page_content for doc in documents],
+                    [doc.metadata.get("filename") for doc in documents]
+                )
             logger.info("Documents added successfully")
         except Exception as e:
             logger.error(f"Error adding documents: {e}")
             raise
+
+    def flush(self):
+        """Persist the lexical index after a batch of additions"""
+        try:
+            self.lexical.save()
+        except Exception as e:
+            logger.error(f"Error saving lexical index {e}")
     
-    def similarity_search(self, query:str, k:int=settings.TOP_K_RESULTS, filter_files: list = []):
-        """Performe Similarity Search"""
+    def _search_kwargs(self, k: int, filter_files: list) -> dict:
+        search_kwargs: dict = {"k": k}
+        
+        # Correct filtering logic for ChromaDB
+        if filter_files and len(filter_files) > 0:
+            if len(filter_files) == 1:
+                # Single file filter
+                search_kwargs["filter"] = {"filename": filter_files[0]}
+            else:
+                # Multiple files filter using $in operator
+                search_kwargs["filter"] = {"filename": {"$in": filter_files}}
+        return search_kwargs
+
+    def _get_by_ids(self, ids: list, with_vectors: bool = False) -> dict:
+        """Fetch chunks by id as {id: (Document, vector or None)}"""
+        if not ids:
+            return {}
+        include = ["documents", "metadatas"] + (["embeddings"] if with_vectors else [])
+        batch = self.vectorestore._collection.get(ids=ids, include=include)
+        vectors = batch["embeddings"] if with_vectors else [None] * len(batch["ids"])
+        return {
+            chunk_id: (Document(page_content=text, metadata=metadata or {}, id=chunk_id), vector)
+            for chunk_id, text, metadata, vector in zip(batch["ids"], batch["documents"], batch["metadatas"], vectors)
+        }
+
+    def _candidates(self, queries: list, query_embeddings: list, filter_files: list, mode: str) -> list:
+        """Candidate pool per query as (docs, vectors): one batched dense query plus BM25, fused for hybrid"""
+        pool = settings.RETRIEVAL_CANDIDATES
+        rankings = [[] for _ in queries]
+        found: dict = {}
+        if mode != "lexical":
+            dense = self.vectorestore._collection.query(
+                query_embeddings=query_embeddings,
+                n_results=pool,
+                where=self._search_kwargs(pool, filter_files).get("filter"),
+                include=["documents", "metadatas", "embeddings"]
+            )
+            for i in range(len(queries)):
+                for chunk_id, text, metadata, vector in zip(
+                    dense["ids"][i], dense["documents"][i], dense["metadatas"][i], dense["embeddings"][i]
+                ):
+                    found[chunk_id] = (Document(page_content=text, metadata=metadata or {}, id=chunk_id), vector)
+                    rankings[i].append(chunk_id)
+        if mode != "vector":
+            for i, query in enumerate(queries):
+                lexical_ids = [chunk_id for chunk_id, _ in self.lexical.search(query, pool, filter_files)]
+                rankings[i] = (
+                    reciprocal_rank_fusion([rankings[i], lexical_ids], k=settings.HYBRID_RRF_K)[:pool]
+                    if mode == "hybrid" else lexical_ids
+                )
+            missing = list({chunk_id for ranking in rankings for chunk_id in ranking if chunk_id not in found})
+            found.update(self._get_by_ids(missing, with_vectors=mode == "hybrid"))
+        results = []
+        for ranking in rankings:
+            ranking = [chunk_id for chunk_id in ranking if chunk_id in found]
+            docs = [found[chunk_id][0] for chunk_id in ranking]
+            vectors = (
+                np.asarray([found[chunk_id][1] for chunk_id in ranking], dtype=np.float32)
+                if mode != "lexical" and ranking else None
+            )
+            results.append((docs, vectors))
+        return results
+
+    def _select(self, query: str, query_embedding, docs: list, vectors, k: int, mode: str) -> list:
+        """Dedupe by content, optionally rerank, then MMR-diversify down to k chunks"""
+        docs, vectors = dedupe(docs, vectors, settings.RETRIEVAL_DEDUPE_SIMILARITY)
+        relevance = self.reranker.score(query, docs)
+        if relevance is None and mode != "vector":
+            # Lexical and hybrid candidates arrive in BM25/RRF order; keep that order as the relevance
+            # so exact-term hits that embed poorly aren't pushed out by cosine similarity
+            if not settings.RETRIEVAL_MMR_ENABLED or vectors is None:
+                return docs[:k]
+            relevance = rank_relevance(len(docs), settings.HYBRID_RRF_K)
+        if relevance is None and vectors is not None:
+            relevance = normalize_rows(vectors) @ normalize_rows(np.asarray(query_embedding, dtype=np.float32))
+        if relevance is None:
+            return docs[:k]
+        if settings.RETRIEVAL_MMR_ENABLED and vectors is not None:
+            picked = mmr(relevance, vectors, k, settings.RETRIEVAL_MMR_LAMBDA)
+        else:
+            picked = [int(i) for i in np.argsort(-relevance)[:k]]
+        return [docs[i] for i in picked]
+
+    def _search_batch(self, queries: list, query_embeddings: list, k: int, filter_files: list, mode: str) -> list:
+        candidates = self._candidates(queries, query_embeddings, filter_files, mode)
+        return [
+            self._select(query, query_embeddings[i] if query_embeddings else None, docs, vectors, k, mode)
+            for i, (query, (docs, vectors)) in enumerate(zip(queries, candidates))
+        ]
+
+    def _search(self, query: str, query_embedding, k: int, filter_files: list, mode: str) -> list:
+        """Dense, BM25 or reciprocal-rank-fused retrieval"""
+        return self._search_batch([query], [query_embedding] if query_embedding is not None else None, k, filter_files, mode)[0]
+
+    @timed("vectorstore.search_batch")
+    def search_batch(self, queries: list, k: int = settings.TOP_K_RESULTS, filter_files: list = [], mode: str = None) -> list:
+        """Retrieve for many questions at once: one embedding call and one vector query for all of them"""
+        mode = mode or settings.RETRIEVAL_MODE
+        if not self.vectorestore or not queries:
+            return [[] for _ in queries]
+        start = time.perf_counter()
+        query_embeddings = self.embedding.embed_queries(queries) if mode != "lexical" else None
+        results = self._search_batch(queries, query_embeddings, k, filter_files, mode)
+        with self._stats_lock:
+            self.retrieval_stats[mode]["queries"] += len(queries)
+            self.retrieval_stats[mode]["total_ms"] += (time.perf_counter() - start) * 1000
+        logger.info(f"Batch {mode} search for {len(queries)} questions")
+        return results
+
+    def _record(self, mode: str, start: float):
+        with self._stats_lock:
+            self.retrieval_stats[mode]["queries"] += 1
+            self.retrieval_stats[mode]["total_ms"] += (time.perf_counter() - start) * 1000
+
+    @timed("vectorstore.similarity_search")
+    def similarity_search(self, query:str, k:int=settings.TOP_K_RESULTS, filter_files: list = [], mode: str = None, query_embedding=None):
+        """Performe Similarity Search (vector, lexical or hybrid, see RETRIEVAL_MODE), reusing query_embedding if given"""
         try:
-            search_kwargs: dict = {"k": k}
-            
-            # Correct filtering logic for ChromaDB
-            if filter_files and len(filter_files) > 0:
-                if len(filter_files) == 1:
-                    # Single file filter
-                    search_kwargs["filter"] = {"filename": filter_files[0]}
-                else:
-                    # Multiple files filter using $in operator
-                    search_kwargs["filter"] = {"filename": {"$in": filter_files}}
+            mode = mode or settings.RETRIEVAL_MODE
+            logger.info(f"Performing {mode} search... Filter: {filter_files or None}")
+            start = time.perf_counter()
             
-            logger.info(f"Performing similarity search... Filter: {search_kwargs.get('filter')}")
+            if self.vectorestore:
+                if query_embedding is None and mode != "lexical":
+                    query_embedding = self.embedding.embed_query(query)
+                results = self._search(query, query_embedding, k, filter_files, mode)
+            else:
+                results = []
+                
+            self._record(mode, start)
+            logger.info(f"Found {len(results)} results") 
+            return results
+        except Exception as e:
+            logger.error(f"Error in similarity search {e}")
+            return []
+
+    @timed("vectorstore.similarity_search")
+    async def asimilarity_search(self, query:str, k:int=settings.TOP_K_RESULTS, filter_files: list = [], mode: str = None, query_embedding=None):
+        """Similarity search with the query embedded through the async Ollama client"""
+        try:
+            mode = mode or settings.RETRIEVAL_MODE
+            logger.info(f"Performing {mode} search... Filter: {filter_files or None}")
+            start = time.perf_counter()
             
             if self.vectorestore:
-                results = self.vectorestore.similarity_search(query, **search_kwargs)
+                if query_embedding is None and mode != "lexical":
+                    query_embedding = await self.embedding.aembed_query(query)
+                # Chroma and the BM25 index are local and synchronous, so only the lookup goes to a thread
+                results = await asyncio.to_thread(self._search, query, query_embedding, k, filter_files, mode)
             else:
                 results = []
                 
+            self._record(mode, start)
             logger.info(f"Found {len(results)} results") 
             return results
         except Exception as e:
             logger.error(f"Error in similarity search {e}")
             return []
+
+    def evaluate(self, cases: list, k: int = settings.TOP_K_RESULTS) -> dict:
+        """recall@k and latency of every retrieval mode over labelled questions
+
+        Each case is {"question", "relevant_ids", "relevant_files"}; a relevant id or
+        file counts as recalled when any of the top-k chunks has it.
+        """
+        report = {}
+        for mode in RETRIEVAL_MODES:
+            recalls, latencies = [], []
+            for case in cases:
+                start = time.perf_counter()
+                docs = self.similarity_search(case["question"], k=k, filter_files=case.get("filter_files") or [], mode=mode)
+                latencies.append((time.perf_counter() - start) * 1000)
+                relevant = set(case.get("relevant_ids") or []) | set(case.get("relevant_files") or [])
+                if not relevant:
+                    continue
+                retrieved = {doc.id for doc in docs} | {doc.metadata.get("filename") for doc in docs}
+                recalls.append(len(relevant & retrieved) / len(relevant))
+            report[mode] = {
+                "recall_at_k": round(sum(recalls) / len(recalls), 4) if recalls else None,
+                "avg_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            }
+        return {"k": k, "cases": len(cases), "modes": report}
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            modes = {
+                mode: {
+                    "queries": values["queries"],
+                    "avg_ms": round(values["total_ms"] / values["queries"], 2) if values["queries"] else 0.0,
+                }
+                for mode, values in self.retrieval_stats.items()
+            }
+        return {
+            "mode": settings.RETRIEVAL_MODE,
+            "modes": modes,
+            "lexical_chunks": len(self.lexical),
+            "lexical_terms": len(self.lexical.postings),
+        }
         
     def delete_collection(self):
         """Delete the entire collection"""
         try:
             self.vectorestore.delete_collection() if self.vectorestore else None
+            self.lexical.clear()
+            self.lexical.save()
             logger.info("Collection deleted")
         except Exception as e:
             logger.error(f"Error deleting collection {e}")
@@ -78,6 +314,52 @@ class VectorestoreService:
         try:
             if self.vectorestore:
                  self.vectorestore._collection.delete(where={"filename": filename})
+                 self.lexical.remove_where(lambda name: name == filename)
+                 self.lexical.save()
                  logger.info(f"Deleted documents for {filename}")
         except Exception as e:
-            logger.error(f"Error deleting document by filename {e}")
\ No newline at end of file
+            logger.error(f"Error deleting document by filename {e}")
+
+    def delete_stale_chunks(self, filename: str, keep_ids: list):
+        """Delete a file's chunks that aren't part of its current version"""
+        try:
+            if not self.vectorestore:
+                return
+            keep = set(keep_ids)
+            stored_ids = self.vectorestore._collection.get(where={"filename": filename}, include=[])["ids"]
+            stale_ids = [chunk_id for chunk_id in stored_ids if chunk_id not in keep]
+            if stale_ids:
+                self.vectorestore._collection.delete(ids=stale_ids)
+                self.lexical.remove_ids(stale_ids)
+                self.lexical.save()
+                logger.info(f"Deleted {len(stale_ids)} stale chunks of {filename}")
+        except Exception as e:
+            logger.error(f"Error deleting stale chunks of {filename} {e}")
+
+    def is_indexed(self, filename: str, content_hash: str, chunk_count: int) -> bool:
+        """Check whether every chunk of this version of the file is already stored"""
+        try:
+            if not self.vectorestore or chunk_count <= 0:
+                return False
+            # Chunks are upserted in order, so the last id being present means the file is complete
+            last_id = make_chunk_id(filename, content_hash, chunk_count - 1)
+            return bool(self.vectorestore._collection.get(ids=[last_id], include=[])["ids"])
+        except Exception as e:
+            logger.error(f"Error checking index state for {filename} {e}")
+            return False
+
+    def delete_orphaned_documents(self, keep_filenames: list):
+        """Delete chunks whose source file is no longer in the documents directory"""
+        try:
+            if not self.vectorestore:
+                return
+            where = {"filename": {"$nin": keep_filenames}} if keep_filenames else None
+            orphan_ids = self.vectorestore._collection.get(where=where, include=[])["ids"]
+            if orphan_ids:
+                self.vectorestore._collection.delete(ids=orphan_ids)
+                keep = set(keep_filenames)
+                self.lexical.remove_where(lambda name: name not in keep)
+                self.lexical.save()
+                logger.info(f"Purged {len(orphan_ids)} chunks of removed documents")
+        except Exception as e:
+            logger.error(f"Error purging orphaned documents {e}")
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Manual scripts that talk to a live Ollama at import time; run them directly, not through pytest
+collect_ignore = ["test_query_classifier.py", "test_services.py"]
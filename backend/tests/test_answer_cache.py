@@ -0,0 +1,78 @@
+import sqlite3
+from core.answer_cache import AnswerCache
+
+CONFIG = {"model": "test-model"}
+
+
+def result(answer: str) -> dict:
+    return {"answer": answer, "metadata": {}}
+
+
+def test_exact_and_semantic_hits_respect_the_threshold():
+    cache = AnswerCache(max_bytes=1 << 20, ttl=60, similarity=0.9)
+    cache.put("How many orders?", [1.0, 0.0], CONFIG, result("42"))
+
+    hit = cache.get("  how many ORDERS? ", None, CONFIG)
+    assert hit["answer"] == "42" and hit["metadata"]["cache"] == "hit"
+    assert cache.get("Number of orders", [0.95, 0.31], CONFIG)["answer"] == "42"
+    assert cache.get("Something else", [0.5, 0.87], CONFIG) is None
+    # Another model is a different scope even for the same question
+    assert cache.get("How many orders?", [1.0, 0.0], {"model": "other"}) is None
+    assert cache.semantic_hits == 1
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("core.answer_cache.time.time", lambda: now[0])
+    cache = AnswerCache(max_bytes=1 << 20, ttl=10, similarity=0.9)
+    cache.put("q", None, CONFIG, result("a"))
+    now[0] += 5
+    assert cache.get("q", None, CONFIG) is not None
+    now[0] += 10
+    assert cache.get("q", None, CONFIG) is None
+    assert cache.stats()["entries"] == 0 and cache.bytes == 0
+
+
+def test_evicts_least_recently_used_past_the_byte_budget():
+    entry_size = len('{"answer": "a", "metadata": {}}')
+    cache = AnswerCache(max_bytes=entry_size * 2, ttl=60, similarity=0.9)
+    cache.put("first", None, CONFIG, result("a"))
+    cache.put("second", None, CONFIG, result("b"))
+    cache.get("first", None, CONFIG)
+    cache.put("third", None, CONFIG, result("c"))
+    assert cache.get("second", None, CONFIG) is None
+    assert cache.get("first", None, CONFIG)["answer"] == "a"
+    assert cache.evictions == 1 and cache.bytes <= cache.max_bytes
+    # Results bigger than the whole budget are never stored
+    cache.put("huge", None, CONFIG, result("x" * entry_size * 2))
+    assert cache.get("huge", None, CONFIG) is None
+
+
+def test_invalidated_on_document_and_database_changes(tmp_path):
+    cache = AnswerCache(max_bytes=1 << 20, ttl=60, similarity=0.9)
+    cache.put("q", None, CONFIG, result("a"))
+    cache.invalidate("document indexed")
+    assert cache.get("q", None, CONFIG) is None
+
+    db_path = tmp_path / "data.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+    cache.db_path = str(db_path)
+    cache.put("q", None, CONFIG, result("a"))
+    assert cache.get("q", None, CONFIG) is not None
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(5000)])
+    assert cache.get("q", None, CONFIG) is None
+
+
+def test_answers_computed_across_an_invalidation_are_not_stored():
+    cache = AnswerCache(max_bytes=1 << 20, ttl=60, similarity=0.9)
+    generation = cache.generation
+    # A document is uploaded while the answer is being generated from the old corpus
+    cache.invalidate("document indexed")
+    cache.put("q", None, CONFIG, result("stale"), generation=generation)
+    assert cache.get("q", None, CONFIG) is None
+    assert cache.stale_puts == 1
+
+    cache.put("q", None, CONFIG, result("fresh"), generation=cache.generation)
+    assert cache.get("q", None, CONFIG)["answer"] == "fresh"
@@ -0,0 +1,47 @@
+from langchain_core.embeddings import Embeddings
+from services.embedding_service import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [float(len(text)), 0.0]
+
+
+def test_queries_are_cached_in_memory_not_on_disk(tmp_path):
+    inner = CountingEmbeddings()
+    cached = CachedEmbeddings(inner, "test", str(tmp_path), batch_size=4, concurrency=1, query_cache_size=2)
+    cached.embed_documents(["a chunk", "another chunk"])
+    assert len(cached.store.rows) == 2
+
+    assert cached.embed_query("a question") == cached.embed_query("a question")
+    assert inner.calls == 3
+    assert len(cached.store.rows) == 2
+    # A question matching a stored chunk is read from the store without being written back
+    assert cached.embed_query("a chunk") == [7.0, 1.0]
+    assert inner.calls == 3
+
+    cached.embed_query("second question")
+    cached.embed_query("third question")
+    cached.embed_query("a question")
+    assert inner.calls == 6
+    assert cached.query_cache.stats()["evictions"] >= 1
+
+
+def test_query_batches_are_embedded_in_one_call_and_not_persisted(tmp_path):
+    inner = CountingEmbeddings()
+    cached = CachedEmbeddings(inner, "test", str(tmp_path), batch_size=4, concurrency=1)
+    cached.embed_query("known question")
+    vectors = cached.embed_queries(["known question", "new one", "new one", "another"])
+    assert vectors[1] == vectors[2]
+    assert inner.calls == 3 and cached.batches == 1
+    assert len(cached.store.rows) == 0
+    assert cached.embed_query("another") == vectors[3]
+    assert inner.calls == 3
@@ -0,0 +1,49 @@
+from services.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def make_index(tmp_path) -> BM25Index:
+    index = BM25Index(str(tmp_path / "lexical.pkl"))
+    index.add(
+        ["a", "b", "c"],
+        ["refund policy for damaged items", "shipping delays in the north region", "replacement part XK-4471 for model v2.1"],
+        ["policy.md", "shipping.md", "parts.md"],
+    )
+    return index
+
+
+def test_tokenize_keeps_codes_together():
+    assert tokenize("Part XK-4471, v2.1 and part_no") == ["part", "xk-4471", "v2.1", "and", "part_no"]
+
+
+def test_search_ranks_matching_chunks_and_filters_by_file(tmp_path):
+    index = make_index(tmp_path)
+    assert [chunk_id for chunk_id, _ in index.search("which part replaces xk-4471", k=3)] == ["c"]
+    assert index.search("refund policy", k=3)[0][0] == "a"
+    assert index.search("refund policy", k=3, filter_files=["shipping.md"]) == []
+    assert index.search("nothing matches", k=3) == []
+
+
+def test_reindexing_and_removal_keep_postings_consistent(tmp_path):
+    index = make_index(tmp_path)
+    index.add(["a"], ["warranty claims"], ["policy.md"])
+    assert index.search("refund", k=3) == []
+    assert index.search("warranty", k=3)[0][0] == "a"
+    assert index.remove_where(lambda filename: filename == "parts.md") == 1
+    assert index.search("xk-4471", k=3) == []
+    assert len(index) == 2
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = make_index(tmp_path)
+    index.save()
+    loaded = BM25Index(index.path)
+    loaded.load()
+    assert len(loaded) == 3
+    assert loaded.search("shipping delays", k=1) == index.search("shipping delays", k=1)
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d", "e"]], k=60)
+    # b is found by both retrievers, so it beats a chunk only one of them ranked first
+    assert fused == ["b", "a", "d", "c", "e"]
+    assert reciprocal_rank_fusion([["x", "y"]]) == ["x", "y"]
@@ -0,0 +1,28 @@
+import httpx
+from services.llm_service import LLMServices
+
+
+def test_default_client_survives_eviction_and_shares_the_transport(monkeypatch):
+    monkeypatch.setattr("config.settings.LLM_WARMUP", False)
+    monkeypatch.setattr("config.settings.LLM_POOL_SIZE", 2)
+    service = LLMServices()
+    service._transport = httpx.HTTPTransport()
+    service._async_transport = httpx.AsyncHTTPTransport()
+    default = service.get_llm()
+    for model in ("other-a", "other-b", "other-c"):
+        service.get_client(model)
+    assert len(service.clients) == 2
+    assert service.get_llm() is default
+    assert default._client._client._transport is service._transport
+    assert default._async_client._client._transport is service._async_transport
+
+
+def test_pool_of_one_still_reuses_the_latest_model(monkeypatch):
+    monkeypatch.setattr("config.settings.LLM_WARMUP", False)
+    monkeypatch.setattr("config.settings.LLM_POOL_SIZE", 1)
+    service = LLMServices()
+    default = service.get_llm()
+    other = service.get_client("other-a")
+    assert service.get_client("other-a") is other
+    service.get_client("other-b")
+    assert set(service.clients) == {(default.model, default.temperature), ("other-b", other.temperature)}
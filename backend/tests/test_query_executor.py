@@ -0,0 +1,90 @@
+import asyncio
+import time
+import pytest
+from core.query_executor import ExecutorSaturatedError, ExecutorTimeoutError, QueryExecutor
+
+
+def test_rejects_when_workers_and_queue_are_full():
+    async def scenario():
+        executor = QueryExecutor(max_workers=1, max_queue=1, timeout=1.0)
+        gate = asyncio.Event()
+        running = asyncio.create_task(executor.arun(gate.wait))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(executor.arun(gate.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorSaturatedError):
+            await executor.arun(gate.wait)
+        gate.set()
+        await asyncio.gather(running, queued)
+        return executor.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+    assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+
+
+def test_times_out_waiting_for_a_worker_and_releases_the_slot():
+    async def scenario():
+        executor = QueryExecutor(max_workers=1, max_queue=1, timeout=0.05)
+        with pytest.raises(ExecutorTimeoutError):
+            await executor.arun(asyncio.sleep, 1)
+        # The timed-out query gave its slot back, so the next one is admitted right away
+        result, wait = await executor.arun(asyncio.sleep, 0, "ok")
+        return executor.stats(), result, wait
+
+    stats, result, wait = asyncio.run(scenario())
+    assert result == "ok" and wait < 0.05
+    assert stats["timed_out"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_thread_slot_is_held_until_the_worker_finishes():
+    async def scenario():
+        executor = QueryExecutor(max_workers=1, max_queue=0, timeout=0.05)
+        with pytest.raises(ExecutorTimeoutError):
+            await executor.run(time.sleep, 0.2)
+        # The thread is still running, so the pool counts as full
+        with pytest.raises(ExecutorSaturatedError):
+            executor.check_admission()
+        await asyncio.sleep(0.3)
+        result, _ = await executor.run(lambda: "done")
+        executor.shutdown()
+        return executor.stats(), result
+
+    stats, result = asyncio.run(scenario())
+    assert result == "done"
+    assert stats["in_flight"] == 0
+
+
+class StalledGraph:
+    async def astream(self, question, config=None):
+        yield "classify_query", {"query_type": "general"}
+        await asyncio.sleep(5)
+        yield "generate_answer", {"answer": "too late"}
+
+
+def test_stream_times_out_and_frees_its_slot_on_disconnect(monkeypatch):
+    import api.routes as routes
+    from api.model import QueryRequest
+
+    async def scenario():
+        executor = QueryExecutor(max_workers=1, max_queue=0, timeout=0.05)
+        monkeypatch.setattr(routes, "rag_system", StalledGraph())
+        monkeypatch.setattr(routes, "query_executor", executor)
+
+        response = await routes.query_stream(QueryRequest(query="hi"))
+        events = [chunk async for chunk in response.body_iterator]
+        assert "event: error" in events[-1] and "timed out" in events[-1]
+        assert executor.in_flight == 0
+
+        # A client that goes away mid-stream doesn't keep the slot
+        response = await routes.query_stream(QueryRequest(query="hi"))
+        await response.body_iterator.__anext__()
+        assert executor.in_flight == 1
+        await response.body_iterator.aclose()
+        return executor.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["in_flight"] == 0
+    assert stats["timed_out"] == 1
@@ -0,0 +1,52 @@
+import numpy as np
+from core.query_router import QueryRouter
+
+
+class FakeSchemaCache:
+    def __init__(self) -> None:
+        self.schema_version = 1
+
+    def ensure_fresh(self):
+        pass
+
+
+class FakeSQL:
+    def __init__(self) -> None:
+        self.db_path = "data.db"
+        self.schema_cache = FakeSchemaCache()
+
+    def get_table_schema(self, table):
+        return {"columns": [{"name": "id"}]}
+
+
+def make_router() -> QueryRouter:
+    router = QueryRouter(None, FakeSQL())
+    router._table_vectors = {"orders": np.array([1.0, 0.0], dtype=np.float32)}
+    router._title_vectors = {"report.md": np.array([0.0, 1.0], dtype=np.float32)}
+    router._schema_version = ("data.db", 1)
+    return router
+
+
+def test_single_source_needs_the_absolute_floor(monkeypatch):
+    monkeypatch.setattr("config.settings.ROUTER_SINGLE_SOURCE_MIN_SIMILARITY", 0.7)
+    router = make_router()
+    assert router._route_by_embedding([1.0, 0.1], ["orders"], [])["query_type"] == "sql"
+    # Weakly related to the only source: left to the LLM classifier instead of routed by default
+    assert router._route_by_embedding([0.6, 0.8], ["orders"], []) is None
+
+
+def test_two_sources_need_a_margin(monkeypatch):
+    monkeypatch.setattr("config.settings.ROUTER_MIN_SIMILARITY", 0.55)
+    monkeypatch.setattr("config.settings.ROUTER_MIN_MARGIN", 0.08)
+    router = make_router()
+    assert router._route_by_embedding([0.2, 1.0], ["orders"], ["report.md"])["query_type"] == "document"
+    assert router._route_by_embedding([1.0, 1.0], ["orders"], ["report.md"]) is None
+
+
+def test_table_vectors_are_dropped_when_the_schema_changes():
+    router = make_router()
+    assert router._missing(["orders"], [])[0] == []
+    router.sql_services.schema_cache.schema_version = 2
+    missing_tables, missing_titles, texts = router._missing(["orders"], ["report.md"])
+    assert missing_tables == ["orders"] and missing_titles == []
+    assert texts == ["orders: id"]
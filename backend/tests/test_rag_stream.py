@@ -0,0 +1,27 @@
+import asyncio
+from core.rag_system import RAG
+
+
+class TokenGraph:
+    async def astream(self, question, config):
+        yield "classify_query", {"query_type": "general", "metadata": {}}
+        for token in ("Hello", " there"):
+            yield "token", token
+        yield "generate_answer", {"answer": "Hello there", "query_type": "general", "metadata": {}}
+
+
+def test_astream_passes_tokens_through_and_times_the_answer(monkeypatch):
+    monkeypatch.setattr("config.settings.ANSWER_CACHE_ENABLED", False)
+    rag = RAG()
+    rag.graph = TokenGraph()
+    rag.initialized = True
+
+    async def collect():
+        return [item async for item in rag.astream("hi")]
+
+    events = asyncio.run(collect())
+    assert [node for node, _ in events] == ["classify_query", "token", "token", "generate_answer"]
+    assert events[1][1] == "Hello"
+    answer = events[-1][1]
+    assert answer["answer"] == "Hello there"
+    assert "total_ms" in answer["metadata"]["timings"]
@@ -0,0 +1,107 @@
+import numpy as np
+from langchain_core.documents import Document
+from services.lexical_index import BM25Index
+from services.reranking import dedupe, mmr, rank_relevance
+from services.vectorstore_service import VectorestoreService
+
+
+class FakeCollection:
+    """Chroma collection stand-in: dense query by cosine, get by id or filename, delete by id"""
+    def __init__(self, chunks: dict) -> None:
+        self.chunks = chunks  # id -> (text, vector)
+
+    def _rows(self, ids: list) -> dict:
+        return {
+            "ids": ids,
+            "documents": [self.chunks[i][0] for i in ids],
+            "metadatas": [{"filename": "doc.md"} for _ in ids],
+            "embeddings": [self.chunks[i][1] for i in ids],
+        }
+
+    def query(self, query_embeddings, n_results, where=None, include=None):
+        results = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+        for query in query_embeddings:
+            ranked = sorted(self.chunks, key=lambda i: -float(np.dot(self.chunks[i][1], query)))[:n_results]
+            for key, value in self._rows(ranked).items():
+                results[key].append(value)
+        return results
+
+    def get(self, ids=None, where=None, include=None):
+        if ids is None:
+            ids = list(self.chunks) if where == {"filename": "doc.md"} else []
+        return self._rows([i for i in ids if i in self.chunks])
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.chunks.pop(chunk_id, None)
+
+
+class FakeStore:
+    def __init__(self, collection) -> None:
+        self._collection = collection
+
+
+def make_service(tmp_path, chunks: dict) -> VectorestoreService:
+    service = VectorestoreService()
+    service.lexical = BM25Index(str(tmp_path / "lexical.pkl"))
+    service.lexical.add(list(chunks), [text for text, _ in chunks.values()], ["doc.md"] * len(chunks))
+    service.vectorestore = FakeStore(FakeCollection(chunks))
+    return service
+
+
+def unit(*values) -> np.ndarray:
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_hybrid_keeps_rare_term_hit_that_embeds_poorly(tmp_path, monkeypatch):
+    monkeypatch.setattr("config.settings.RETRIEVAL_CANDIDATES", 20)
+    query = unit(1, 0, 0)
+    chunks = {f"near-{i}": (f"general shipping overview section {i}", unit(np.cos(0.25 * i), np.sin(0.25 * i), 0.01)) for i in range(6)}
+    # Only this chunk contains the part number, but its embedding points away from the question
+    chunks["rare"] = ("replacement for part XK-4471 is listed here", unit(0, 0, 1))
+    service = make_service(tmp_path, chunks)
+
+    for mmr_enabled in (True, False):
+        monkeypatch.setattr("config.settings.RETRIEVAL_MMR_ENABLED", mmr_enabled)
+        results = service._search("which part replaces XK-4471", query.tolist(), 3, [], "hybrid")
+        assert "rare" in [doc.id for doc in results]
+        # Pure dense retrieval ranks it last
+        dense = service._search("which part replaces XK-4471", query.tolist(), 3, [], "vector")
+        assert "rare" not in [doc.id for doc in dense]
+
+
+def test_dedupe_drops_exact_and_near_duplicates():
+    docs = [Document(page_content=text) for text in ("Alpha  beta", "alpha beta", "alpha beta!", "gamma")]
+    vectors = np.stack([unit(1, 0, 0), unit(1, 0, 0), unit(1, 0.01, 0), unit(0, 1, 0)])
+    kept, kept_vectors = dedupe(docs, vectors, threshold=0.98)
+    assert [doc.page_content for doc in kept] == ["Alpha  beta", "gamma"]
+    assert kept_vectors.shape == (2, 3)
+    # Without a threshold only the whitespace/case copy goes
+    kept, _ = dedupe(docs, vectors)
+    assert [doc.page_content for doc in kept] == ["Alpha  beta", "alpha beta!", "gamma"]
+
+
+def test_mmr_trades_relevance_for_diversity():
+    relevance = np.array([1.0, 0.95, 0.5])
+    # The runner-up is a copy of the best candidate, the third one covers something else
+    vectors = np.stack([unit(1, 0), unit(1, 0.01), unit(0, 1)])
+    assert mmr(relevance, vectors, k=2, lambda_mult=0.5) == [0, 2]
+    assert mmr(relevance, vectors, k=2, lambda_mult=1.0) == [0, 1]
+    assert mmr(relevance, vectors, k=5, lambda_mult=0.5) == [0, 2, 1]
+    assert mmr(relevance[:1], vectors[:1], k=3, lambda_mult=0.5) == [0]
+
+
+def test_rank_relevance_keeps_the_input_order():
+    relevance = rank_relevance(4)
+    assert relevance[0] == 1.0 and relevance[-1] == 0.0
+    assert list(relevance) == sorted(relevance, reverse=True)
+
+
+def test_reindex_deletes_only_stale_chunks(tmp_path):
+    chunks = {f"doc.md:{version}:{i}": (f"chunk {i} of {version}", unit(1, i, 0)) for version in ("old", "new") for i in range(3)}
+    service = make_service(tmp_path, chunks)
+    keep = [f"doc.md:new:{i}" for i in range(3)]
+    service.delete_stale_chunks("doc.md", keep)
+    assert sorted(service.vectorestore._collection.chunks) == keep
+    assert sorted(service.lexical.chunks) == keep
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+from core.graph import Graph
+
+
+class FakeEmbedding:
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+class FakeVectorstore:
+    def __init__(self) -> None:
+        self.embedding = FakeEmbedding()
+        self.release = threading.Event()
+
+    def similarity_search(self, question, filter_files=None, query_embedding=None):
+        self.release.wait(5)
+        return ["doc"]
+
+
+class FakeRouter:
+    def __init__(self, query_type: str) -> None:
+        self.query_type = query_type
+
+    def route(self, question, tables, documents, config):
+        return {"query_type": self.query_type, "confidence": 1.0, "reasoning": "", "tier": "rules", "route_ms": 0.0}
+
+
+def make_graph(monkeypatch, query_type: str) -> Graph:
+    monkeypatch.setattr("config.settings.SPECULATIVE_RETRIEVAL", True)
+    monkeypatch.setattr("config.settings.QUERY_MAX_WORKERS", 1)
+    graph = Graph(None, FakeVectorstore(), None, None, None)
+    graph.router = FakeRouter(query_type)
+    graph._classifier_inputs = lambda state: {"question": state["question"], "tables": ["orders"], "documents": ["report.md"]}
+    return graph
+
+
+def test_speculation_is_skipped_when_no_worker_is_idle(monkeypatch):
+    graph = make_graph(monkeypatch, "document")
+    busy = graph._submit_speculation("earlier question", [1.0, 0.0], [])
+    state = graph.classify_query({"question": "q", "config": {}})
+    assert state["metadata"]["speculation"] == "skipped"
+    assert state.get("speculative_docs") is None
+    graph.vectorstore_services.release.set()
+    busy.result()
+
+    state = graph.classify_query({"question": "q", "config": {}})
+    assert state["metadata"]["speculation"] == "used" and state["speculative_docs"] == ["doc"]
+
+
+def test_unneeded_speculation_gives_its_worker_back(monkeypatch):
+    graph = make_graph(monkeypatch, "sql")
+    graph.vectorstore_services.release.set()
+    for _ in range(3):
+        state = graph.classify_query({"question": "q", "config": {}})
+        assert state["metadata"]["speculation"] == "discarded"
+    graph._speculation_pool.shutdown(wait=True)
+    assert graph._speculation_slots.acquire(blocking=False)
+
+
+class FailingEmbedding:
+    def embed_query(self, text):
+        raise ConnectionError("embedding model unreachable")
+
+    async def aembed_query(self, text):
+        raise ConnectionError("embedding model unreachable")
+
+
+def test_embedding_failure_skips_speculation_but_still_routes(monkeypatch):
+    graph = make_graph(monkeypatch, "document")
+    graph.vectorstore_services.embedding = FailingEmbedding()
+    state = graph.classify_query({"question": "q", "config": {}})
+    assert state["query_type"] == "document"
+    assert state["metadata"]["speculation"] == "skipped"
+
+    async def aroute(question, tables, documents, config):
+        return graph.router.route(question, tables, documents, config)
+
+    graph.router.aroute = aroute
+    state = asyncio.run(graph.aclassify_query({"question": "q", "config": {}}))
+    assert state["query_type"] == "document"
+    assert state["metadata"]["speculation"] == "skipped"
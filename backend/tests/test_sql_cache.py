@@ -0,0 +1,25 @@
+from services.sql_cache import LRUCache, is_deterministic
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1
+    assert stats["hits"] == 3 and stats["misses"] == 1
+    cache.clear()
+    assert cache.get("a") is None
+
+
+def test_is_deterministic():
+    assert is_deterministic("SELECT region, COUNT(*) FROM orders GROUP BY region")
+    assert is_deterministic("SELECT random_seed FROM settings")
+    assert not is_deterministic("SELECT * FROM orders ORDER BY RANDOM() LIMIT 5")
+    assert not is_deterministic("SELECT * FROM orders WHERE created_at > date('now', '-7 days')")
+    assert not is_deterministic("SELECT CURRENT_TIMESTAMP")
+    assert not is_deterministic("SELECT last_insert_rowid()")
@@ -0,0 +1,54 @@
+import sqlite3
+import time
+import pytest
+from services.sql_pool import ReadOnlyPool
+from services.sql_services import SQLService
+
+
+@pytest.fixture
+def service(tmp_path):
+    db_path = tmp_path / "data.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, note TEXT)")
+        conn.executemany("INSERT INTO orders VALUES (?, ?)", [(i, f"order {i}") for i in range(1, 501)])
+    service = SQLService()
+    service.pool = ReadOnlyPool(str(db_path))
+    service.db = object()
+    service.db_path = str(db_path)
+    yield service
+    service.pool.dispose()
+
+
+def test_rows_are_capped_and_the_total_counted(service, monkeypatch):
+    monkeypatch.setattr("config.settings.SQL_MAX_ROWS", 100)
+    result = service.execute_sql("SELECT * FROM orders;")
+    assert len(result["rows"]) == 100
+    assert result["truncated"] and result["total_count"] == 500
+    assert result["rows"][0] == {"id": 1, "note": "order 1"}
+
+    small = service.execute_sql("SELECT * FROM orders WHERE id <= 10")
+    assert len(small["rows"]) == 10 and not small["truncated"] and small["total_count"] == 10
+
+
+def test_bytes_are_capped(service, monkeypatch):
+    monkeypatch.setattr("config.settings.SQL_MAX_BYTES", 200)
+    result = service.execute_sql("SELECT * FROM orders")
+    assert result["truncated"]
+    assert 0 < len(result["rows"]) < 20
+
+
+def test_full_result_is_paged_by_result_id(service, monkeypatch):
+    monkeypatch.setattr("config.settings.SQL_MAX_ROWS", 100)
+    result = service.execute_sql("SELECT id FROM orders ORDER BY id")
+    page = service.fetch_page(result["result_id"], page=5, page_size=100)
+    assert page["rows"][0] == {"id": 401} and len(page["rows"]) == 100
+    assert not page["has_more"]
+
+
+def test_long_running_statement_is_interrupted(service, monkeypatch):
+    monkeypatch.setattr("config.settings.SQL_TIMEOUT", 0.1)
+    endless = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT COUNT(*) FROM n"
+    start = time.monotonic()
+    with pytest.raises(Exception, match="interrupted"):
+        service.execute_sql(endless)
+    assert time.monotonic() - start < 5
@@ -1,3 +1,4 @@
+import re
 from pathlib import Path
 def get_file_extension(filename):
     """Get the file extension"""
@@ -15,4 +16,9 @@ def sanitize_filename(filename: str) -> str:
     # Remove path traversal attempts
     filename = Path(filename).name
     # Remove special characters except dots and underscores
-    return "".join(c for c in filename if c.isalnum() or c in '._- ')
\ No newline at end of file
+    return "".join(c for c in filename if c.isalnum() or c in '._- ')
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    return re.sub(r"\s+", " ", question.lower()).strip().rstrip("?!. ")
@@ -0,0 +1,160 @@
+import contextvars
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+NODE_SECONDS = Histogram("rag_node_seconds", "Graph node latency", ["node"], buckets=LATENCY_BUCKETS)
+SERVICE_SECONDS = Histogram("rag_service_seconds", "Service method latency", ["operation"], buckets=LATENCY_BUCKETS)
+QUERY_SECONDS = Histogram("rag_query_seconds", "End-to-end query latency", ["query_type"], buckets=LATENCY_BUCKETS)
+IN_FLIGHT = Gauge("rag_in_flight", "Calls currently running", ["operation"])
+ERRORS = Counter("rag_errors_total", "Calls that raised", ["operation"])
+LLM_TOKENS = Counter("rag_llm_tokens_total", "Tokens reported by Ollama", ["model", "kind"])
+
+# Per-request breakdown; the dict is shared by every thread/task copied from the request's context
+_request = contextvars.ContextVar("rag_request_metrics", default=None)
+
+
+@contextmanager
+def track_request():
+    """Collect node/service timings and token counts of one query into a summary dict"""
+    summary = {"nodes": {}, "services": {}, "prompt_tokens": 0, "completion_tokens": 0}
+    token = _request.set(summary)
+    start = time.perf_counter()
+    try:
+        yield summary
+    finally:
+        summary["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        _request.reset(token)
+
+
+def _record(kind: str, name: str, elapsed: float):
+    summary = _request.get()
+    if summary is not None:
+        summary[kind][name] = round(summary[kind].get(name, 0.0) + elapsed * 1000, 2)
+
+
+def _instrument(func, histogram, kind: str, name: str):
+    """Wrap a sync function, coroutine function or async generator with latency/in-flight/error metrics"""
+    observe = histogram.labels(name).observe
+    in_flight = IN_FLIGHT.labels(name)
+    errors = ERRORS.labels(name)
+
+    def finish(start: float):
+        elapsed = time.perf_counter() - start
+        observe(elapsed)
+        in_flight.dec()
+        _record(kind, name, elapsed)
+
+    if inspect.isasyncgenfunction(func):
+        @functools.wraps(func)
+        async def agen_wrapper(*args, **kwargs):
+            in_flight.inc()
+            start = time.perf_counter()
+            try:
+                async for item in func(*args, **kwargs):
+                    yield item
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                finish(start)
+        return agen_wrapper
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            in_flight.inc()
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                finish(start)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            finish(start)
+    return wrapper
+
+
+def timed(operation: str):
+    """Decorator for service methods, e.g. @timed("vectorstore.similarity_search")"""
+    return lambda func: _instrument(func, SERVICE_SECONDS, "services", operation)
+
+
+def timed_node(name: str, func):
+    """Instrumented graph node function"""
+    return _instrument(func, NODE_SECONDS, "nodes", name)
+
+
+def observe_query(query_type: str, seconds: float):
+    QUERY_SECONDS.labels(query_type or "unknown").observe(seconds)
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """Reads prompt/completion token counts from the final Ollama response of every LLM call"""
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                info = generation.generation_info or {}
+                prompt = info.get("prompt_eval_count") or 0
+                completion = info.get("eval_count") or 0
+                model = info.get("model", "unknown")
+                LLM_TOKENS.labels(model, "prompt").inc(prompt)
+                LLM_TOKENS.labels(model, "completion").inc(completion)
+                summary = _request.get()
+                if summary is not None:
+                    summary["prompt_tokens"] += prompt
+                    summary["completion_tokens"] += completion
+
+
+token_usage_callback = TokenUsageCallback()
+
+
+class StatsCollector:
+    """Exposes the numeric values of registered stats() dicts (caches, pools, router) as gauges"""
+    def __init__(self) -> None:
+        self.sources: dict = {}
+
+    def register(self, name: str, stats_fn):
+        self.sources[name] = stats_fn
+
+    def _flatten(self, prefix: str, stats: dict):
+        for key, value in stats.items():
+            name = f"{prefix}_{key}"
+            if isinstance(value, dict):
+                yield from self._flatten(name, value)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield name, value
+
+    def collect(self):
+        for source, stats_fn in list(self.sources.items()):
+            try:
+                stats = stats_fn()
+            except Exception:
+                continue
+            for name, value in self._flatten(f"rag_{source}", stats):
+                gauge = GaugeMetricFamily(name, f"{source} stat")
+                gauge.add_metric([], value)
+                yield gauge
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
@@ -0,0 +1,94 @@
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+from utils.logger import logger
+
+# Imported one by one while warming so the startup profile shows what each costs;
+# whatever core.rag_system still has to load after them is reported under its own name
+PROFILED_IMPORTS = (
+    "sqlalchemy",
+    "langchain_core.language_models",
+    "langchain_community.utilities.sql_database",
+    "langchain_ollama",
+    "langchain_chroma",
+    "langgraph.graph",
+    "dspy",
+    "core.rag_system",
+)
+SERVICES = ("llm", "vectorstore", "sql", "catalog", "graph", "documents")
+
+
+class StartupProfile:
+    """Startup timeline and per-service readiness, measured from the import of main"""
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.milestones: dict = {}
+        self.phases: dict = {}
+        self.services = {name: {"state": "pending"} for name in SERVICES}
+        self.error = ""
+        self._lock = threading.Lock()
+
+    def _elapsed(self) -> float:
+        return round(time.perf_counter() - self.started, 3)
+
+    def mark(self, milestone: str):
+        """Record when the process reached a milestone (serving, ready, warm)"""
+        self.milestones[milestone] = self._elapsed()
+        logger.info(f"Startup: {milestone} after {self.milestones[milestone]}s")
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = {"at_s": round(start - self.started, 3), "seconds": round(time.perf_counter() - start, 3)}
+
+    @contextmanager
+    def service(self, name: str):
+        """Track a service's state (starting -> ready/failed) and how long its initialization took"""
+        self.services[name] = {"state": "starting"}
+        start = time.perf_counter()
+        try:
+            with self.phase(f"init {name}"):
+                yield
+        except Exception as e:
+            self.services[name] = {"state": "failed", "error": str(e)}
+            raise
+        self.services[name] = {"state": "ready", "seconds": round(time.perf_counter() - start, 3)}
+
+    def import_modules(self):
+        for module in PROFILED_IMPORTS:
+            with self.phase(f"import {module}"):
+                importlib.import_module(module)
+
+    def fail(self, error: Exception):
+        self.error = str(error)
+        for state in self.services.values():
+            if state["state"] == "starting":
+                state["state"] = "failed"
+            elif state["state"] == "pending":
+                state["state"] = "skipped"
+
+    def status(self) -> str:
+        states = [service["state"] for service in self.services.values()]
+        if self.error or "failed" in states:
+            return "failed"
+        if "ready" in self.milestones:
+            return "healthy" if "warm" in self.milestones else "warming"
+        return "starting"
+
+    def report(self) -> dict:
+        return {
+            "status": self.status(),
+            "uptime_s": self._elapsed(),
+            "milestones": dict(self.milestones),
+            "services": {name: dict(state) for name, state in self.services.items()},
+            "phases": dict(sorted(self.phases.items(), key=lambda item: item[1]["at_s"])),
+            "error": self.error,
+        }
+
+
+startup = StartupProfile()
@@ -32,6 +32,57 @@ class APIService {
     }
   }
 
+  // Streams a query as Server-Sent Events, calling onEvent(event, data) for each one
+  async queryStream(query, config = {}, onEvent = () => {}) {
+    try {
+      const response = await fetch(`${this.baseURL}/api/query/stream`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ 
+            query,
+            model: config.model,
+            selected_files: config.selectedFiles,
+            selected_tables: config.selectedTables
+        }),
+      });
+
+      if (!response.ok) {
+        const error = await response.json();
+        throw new Error(error.detail || 'Failed to process query');
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let result = null;
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = raw.match(/^data: (.*)$/m)?.[1];
+          if (!event || !data) continue;
+          const payload = JSON.parse(data);
+          if (event === 'error') throw new Error(payload.detail);
+          if (event === 'done') result = payload;
+          onEvent(event, payload);
+        }
+      }
+
+      return result;
+    } catch (error) {
+      console.error('Query stream error:', error);
+      throw error;
+    }
+  }
+
   async uploadDocument(file) {
     try {
       const formData = new FormData();